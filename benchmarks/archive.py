@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Measure how fast flo writes archives with every available codec on a
+growing number of threads:
+
+    ./benchmarks/archive.py [--megabytes N] [--threads N [N ...]]
+"""
+
+import os
+import time
+import shutil
+import random
+import argparse
+import tempfile
+
+from flo import archives
+
+
+def make_data(directory, megabytes):
+    """Write `megabytes` of compressible text to files in `directory`"""
+    random.seed(0)
+    words = ['%x' % random.getrandbits(random.randint(4, 32))
+             for i in range(10000)]
+    filenames = []
+    for i in range(megabytes):
+        filename = 'data/%d.txt' % i
+        with open(os.path.join(directory, filename), 'w') as stream:
+            size = 0
+            while size < 2**20:
+                line = ' '.join(random.sample(words, 12)) + '\n'
+                stream.write(line)
+                size += len(line)
+        filenames.append(filename)
+    return filenames
+
+
+def benchmark(directory, filenames, codec, threads):
+    """Return the time it takes to write an archive and its size"""
+    archive = os.path.join(directory, 'archive' + codec.extension)
+    t0 = time.time()
+    archives.write_tar(archive, directory, filenames, codec, threads=threads)
+    seconds = time.time() - t0
+    size = os.path.getsize(archive)
+    os.remove(archive)
+    return seconds, size
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--megabytes', type=int, default=64)
+parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp(prefix='flo-benchmark-')
+try:
+    os.makedirs(os.path.join(directory, 'data'))
+    filenames = make_data(directory, args.megabytes)
+    for name in sorted(archives.CODECS):
+        for threads in args.threads:
+            seconds, size = benchmark(
+                directory, filenames, archives.get_codec(name), threads,
+            )
+            print("%6s %2d threads %8.1f MB/s %10s" % (
+                name, threads, args.megabytes / seconds,
+                archives.format_size(size),
+            ))
+finally:
+    shutil.rmtree(directory)
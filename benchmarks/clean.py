@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""Measure how long `flo clean` takes to remove the targets of many tasks
+that each create a directory of files, compared to running `rm -rf`
+for every target:
+
+    ./benchmarks/clean.py [--tasks N] [--files N] [--jobs N [N ...]]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from flo.tasks.graph import TaskGraph
+
+
+def make_targets(directory, n_tasks, n_files):
+    for i in range(n_tasks):
+        target = os.path.join(directory, 'data', str(i))
+        os.makedirs(target)
+        for j in range(n_files):
+            open(os.path.join(target, '%d.dat' % j), 'w').close()
+
+
+def benchmark(directory, n_tasks, n_files, jobs):
+    """Return the time it takes flo to clean `n_tasks` targets on `jobs`
+    threads, or with `rm -rf` for every target if `jobs` is None
+    """
+    task_kwargs_list = [
+        {'creates': 'data/%d' % i, 'command': 'true'}
+        for i in range(n_tasks)
+    ]
+    config_path = os.path.join(directory, 'flo.yaml')
+    task_graph = TaskGraph(config_path, task_kwargs_list)
+    make_targets(directory, n_tasks, n_files)
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            t0 = time.time()
+            if jobs is None:
+                for task in task_graph.task_list:
+                    subprocess.check_call(
+                        ['rm', '-rf', task.creates], cwd=directory,
+                    )
+            else:
+                task_graph.clean(jobs=jobs)
+            return time.time() - t0
+        finally:
+            sys.stdout = stdout
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--tasks', type=int, default=1000)
+parser.add_argument('--files', type=int, default=10)
+parser.add_argument('--jobs', type=int, nargs='+', default=[1, 4, 16])
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp(prefix='flo-benchmark-')
+try:
+    for jobs in [None] + args.jobs:
+        seconds = benchmark(directory, args.tasks, args.files, jobs)
+        name = 'rm -rf' if jobs is None else '%d jobs' % jobs
+        print("%10s %8.2f ms per task" % (name, 1000 * seconds / args.tasks))
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""Compare the throughput of the hash algorithms that flo can use to
+calculate the state of resources. By default, this hashes a
+temporary file of random data; pass a filename to hash that file
+instead:
+
+    ./benchmarks/hash_algorithms.py [FILENAME] [--size MB]
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from flo.resources import hashes
+
+
+def hash_file(filename, algorithm):
+    with open(filename) as stream:
+        return hashes.stream_state(stream, algorithm)
+
+
+def benchmark(filename, algorithm, repeat):
+    """Return the best time to hash `filename` out of `repeat` tries. The
+    first try warms up the file system cache.
+    """
+    hash_file(filename, algorithm)
+    times = []
+    for i in range(repeat):
+        t0 = time.time()
+        hash_file(filename, algorithm)
+        times.append(time.time() - t0)
+    return min(times)
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('filename', nargs='?')
+parser.add_argument('--size', type=int, default=256,
+                    help='size (in MB) of the random file to hash')
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+filename = args.filename
+if filename is None:
+    fd, filename = tempfile.mkstemp(prefix='flo-benchmark-')
+    with os.fdopen(fd, 'w') as stream:
+        for i in range(args.size):
+            stream.write(os.urandom(2**20))
+
+try:
+    megabytes = os.path.getsize(filename) / float(2**20)
+    print("hashing %.0f MB from %s" % (megabytes, filename))
+    for algorithm in sorted(hashes.ALGORITHMS):
+        seconds = benchmark(filename, algorithm, args.repeat)
+        print("%10s %10.1f MB/s" % (algorithm, megabytes / seconds))
+    for algorithm in sorted(hashes.OPTIONAL_PACKAGES):
+        if algorithm not in hashes.ALGORITHMS:
+            print("%10s not available (pip install %s)" % (
+                algorithm, hashes.OPTIONAL_PACKAGES[algorithm],
+            ))
+finally:
+    if args.filename is None:
+        os.remove(filename)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""Measure how long it takes to load a large workflow by generating a
+synthetic flo.yaml with many templated tasks:
+
+    ./benchmarks/load_graph.py [--tasks N] [--repeat N]
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+from flo import parser as flo_parser
+from flo.tasks.graph import TaskGraph
+
+
+def write_config(directory, n_tasks):
+    """Write a flo.yaml where every task depends on the task before it
+    and a shared script, and uses templates in every field.
+    """
+    config_path = os.path.join(directory, 'flo.yaml')
+    with open(config_path, 'w') as stream:
+        stream.write('---\nsrc: "src/process.py"\ntasks:\n')
+        stream.write('  - creates: "data/0.dat"\n')
+        stream.write('    command: "touch {{creates}}"\n')
+        for i in range(1, n_tasks):
+            stream.write('  - creates: "data/{{n}}.dat"\n')
+            stream.write('    n: %d\n' % i)
+            stream.write('    depends:\n')
+            stream.write('      - "{{src}}"\n')
+            stream.write('      - "data/%d.dat"\n' % (i - 1))
+            stream.write('    command:\n')
+            stream.write(
+                '      - "python {{depends[0]}} {{n}} > {{creates}}"\n'
+            )
+            stream.write('      - "wc -l {{creates}}"\n')
+    return config_path
+
+
+def best_time(func, repeat):
+    """Return the result of `func` and the best time it takes to run it out
+    of `repeat` tries
+    """
+    times = []
+    for i in range(repeat):
+        t0 = time.time()
+        result = func()
+        times.append(time.time() - t0)
+    return result, min(times)
+
+
+def benchmark(config_path, repeat):
+    """Print how long it takes to parse the configuration, to load it from
+    the cache in .flo/ and to build the TaskGraph
+    """
+    with open(config_path) as stream:
+        contents = stream.read()
+    parse_time = best_time(
+        lambda: flo_parser.parse_config(config_path, contents), repeat,
+    )[1]
+    flo_parser.load_config.func(config_path)
+    (global_config, task_kwargs_list), cache_time = best_time(
+        lambda: flo_parser.load_config.func(config_path), repeat,
+    )
+    build_time = best_time(
+        lambda: TaskGraph(config_path, task_kwargs_list, global_config),
+        repeat,
+    )[1]
+    print("%30s %8.3f s" % ('parse flo.yaml', parse_time))
+    print("%30s %8.3f s" % ('load flo.yaml from the cache', cache_time))
+    print("%30s %8.3f s" % ('build TaskGraph', build_time))
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--tasks', type=int, default=10000)
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp(prefix='flo-benchmark-')
+try:
+    config_path = write_config(directory, args.tasks)
+    print("%d tasks, %s YAML loader" % (
+        args.tasks, flo_parser.YAML_LOADER.__name__,
+    ))
+    benchmark(config_path, args.repeat)
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+"""Measure how long it takes to run many short python tasks, either as
+`python script.py` shell commands or as python tasks that call a
+function in the pool of python workers:
+
+    ./benchmarks/python_tasks.py [--tasks N] [--jobs N] [--module MODULE]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+from flo.tasks.graph import TaskGraph
+
+SCRIPT = '''import sys
+import %(module)s
+
+
+def touch(filename):
+    open(filename, 'w').close()
+
+
+if __name__ == '__main__':
+    touch(sys.argv[1])
+'''
+
+
+def benchmark(directory, n_tasks, command_type, jobs):
+    """Return the time it takes flo to run `n_tasks` python tasks"""
+    task_kwargs_list = []
+    for i in range(n_tasks):
+        task_kwargs = {'creates': 'data/%d.dat' % i}
+        if command_type == 'python':
+            task_kwargs['command_type'] = 'python'
+            task_kwargs['command'] = 'script:touch {{creates}}'
+        else:
+            task_kwargs['command'] = '%s script.py {{creates}}' % (
+                sys.executable,
+            )
+        task_kwargs_list.append(task_kwargs)
+    config_path = os.path.join(directory, 'flo.yaml')
+    task_graph = TaskGraph(config_path, task_kwargs_list)
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            t0 = time.time()
+            task_graph.run_all(jobs=jobs)
+            return time.time() - t0
+        finally:
+            sys.stdout = stdout
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--tasks', type=int, default=100)
+parser.add_argument('--jobs', type=int, default=1)
+parser.add_argument(
+    '--module', default='numpy',
+    help='The module that every task imports (default: numpy).',
+)
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp(prefix='flo-benchmark-')
+try:
+    os.makedirs(os.path.join(directory, 'data'))
+    with open(os.path.join(directory, 'script.py'), 'w') as stream:
+        stream.write(SCRIPT % {'module': args.module})
+    for command_type in ['shell', 'python']:
+        seconds = benchmark(directory, args.tasks, command_type, args.jobs)
+        print("%10s %8.2f ms per task" % (
+            command_type, 1000 * seconds / args.tasks,
+        ))
+finally:
+    shutil.rmtree(directory)
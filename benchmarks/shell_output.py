@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""Measure how quickly flo can pass the output of commands through to the
+terminal and .flo/flo.log by running a workflow whose only task prints
+a lot of output, either as lines or as a progress bar that uses
+carriage returns:
+
+    ./benchmarks/shell_output.py [--size MB] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+from flo.tasks.graph import TaskGraph
+
+GENERATE_SCRIPT = """
+import sys
+mode, size = sys.argv[1], int(sys.argv[2]) * 2**20
+if mode == 'lines':
+    chunk = ('x' * 79 + '\\n') * 1000
+else:
+    chunk = ''.join('\\rprogress %8d' % i for i in range(5000))
+for i in range(size // len(chunk)):
+    sys.stdout.write(chunk)
+"""
+
+
+def benchmark(directory, mode, size, repeat):
+    """Return the best time it takes flo to run a task that prints `size`
+    MB of output
+    """
+    config_path = os.path.join(directory, 'flo.yaml')
+    task_graph = TaskGraph(config_path, [{
+        'creates': 'output-%s' % mode,
+        'command': [
+            '%s generate.py %s %d' % (sys.executable, mode, size),
+            'touch {{creates}}',
+        ],
+    }])
+    task = task_graph.task_list[0]
+    times = []
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            for i in range(repeat):
+                t0 = time.time()
+                task.timed_run()
+                times.append(time.time() - t0)
+        finally:
+            sys.stdout = stdout
+    return min(times)
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--size', type=int, default=64,
+                    help='amount of output (in MB) that the task prints')
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp(prefix='flo-benchmark-')
+try:
+    with open(os.path.join(directory, 'generate.py'), 'w') as stream:
+        stream.write(GENERATE_SCRIPT)
+    for mode in ['lines', 'progress']:
+        seconds = benchmark(directory, mode, args.size, args.repeat)
+        print("%10s %10.1f MB/s" % (mode, args.size / seconds))
+finally:
+    shutil.rmtree(directory)
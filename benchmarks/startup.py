@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""Measure how long it takes to start flo, which matters most for tab
+completion and for `flo status` on workflows that are in sync. By
+default, this uses a copy of examples/hello-world; pass a directory
+with a flo.yaml to use that workflow instead:
+
+    ./benchmarks/startup.py [DIRECTORY] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+flo_script = os.path.join(root_dir, 'bin', 'flo')
+
+COMMANDS = [
+    ('import flo.commands', [sys.executable, '-c', 'import flo.commands']),
+    ('flo --help', [sys.executable, flo_script, '--help']),
+    ('flo status', [sys.executable, flo_script, 'status']),
+]
+
+# modules that used to be imported by every flo command and should not
+# be anymore
+SLOW_MODULES = ['networkx']
+
+
+def benchmark(command, directory, repeat):
+    """Return all of the times it takes to run `command` in `directory`"""
+    times = []
+    with open(os.devnull, 'w') as devnull:
+        for i in range(repeat):
+            t0 = time.time()
+            subprocess.check_call(command, cwd=directory, stdout=devnull,
+                                  stderr=devnull)
+            times.append(time.time() - t0)
+    return sorted(times)
+
+
+def imported_slow_modules():
+    code = "import sys, flo.commands; print(' '.join(sys.modules))"
+    modules = subprocess.check_output([sys.executable, '-c', code]).split()
+    return [module for module in SLOW_MODULES if module in modules]
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('directory', nargs='?')
+parser.add_argument('--repeat', type=int, default=10)
+args = parser.parse_args()
+
+directory = args.directory
+if directory is None:
+    directory = tempfile.mkdtemp(prefix='flo-benchmark-')
+    shutil.rmtree(directory)
+    shutil.copytree(os.path.join(root_dir, 'examples', 'hello-world'),
+                    directory)
+
+try:
+    # run the workflow once so that `flo status` does not include the
+    # time it takes to run any tasks
+    benchmark([sys.executable, flo_script, 'run'], directory, 1)
+    for name, command in COMMANDS:
+        times = benchmark(command, directory, args.repeat)
+        print("%20s   min %6.3f s   median %6.3f s" % (
+            name, times[0], times[len(times) // 2],
+        ))
+    slow_modules = imported_slow_modules()
+    if slow_modules:
+        print("flo.commands imports %s" % ', '.join(slow_modules))
+finally:
+    if args.directory is None:
+        shutil.rmtree(directory)
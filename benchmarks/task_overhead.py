@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""Measure how much time flo spends on each task, apart from running its
+commands, by running a workflow of tasks that do (almost) nothing,
+with and without forcing every command to run in a shell:
+
+    ./benchmarks/task_overhead.py [--tasks N] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+from flo.tasks.graph import TaskGraph
+
+
+def benchmark(directory, n_tasks, use_shell, repeat):
+    """Return the best time it takes flo to run `n_tasks` no-op tasks"""
+    task_kwargs_list = []
+    for i in range(n_tasks):
+        task_kwargs = {
+            'creates': 'data/%d.dat' % i,
+            'command': 'touch {{creates}}',
+        }
+        if use_shell:
+            task_kwargs['shell'] = True
+        task_kwargs_list.append(task_kwargs)
+    config_path = os.path.join(directory, 'flo.yaml')
+    task_graph = TaskGraph(config_path, task_kwargs_list)
+    times = []
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            for i in range(repeat):
+                t0 = time.time()
+                task_graph.run_all()
+                times.append(time.time() - t0)
+        finally:
+            sys.stdout = stdout
+    return min(times)
+
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--tasks', type=int, default=1000)
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+directory = tempfile.mkdtemp(prefix='flo-benchmark-')
+try:
+    os.makedirs(os.path.join(directory, 'data'))
+    for use_shell, name in [(False, 'direct'), (True, 'shell')]:
+        seconds = benchmark(directory, args.tasks, use_shell, args.repeat)
+        print("%10s %8.2f ms per task" % (name, 1000 * seconds / args.tasks))
+finally:
+    shutil.rmtree(directory)
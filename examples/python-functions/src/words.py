@@ -0,0 +1,24 @@
+"""Functions that are called by the python tasks in flo.yaml"""
+
+import os
+import collections
+
+
+def hello_world(filename, n):
+    directory = os.path.dirname(filename)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(filename, 'w') as stream:
+        for i in range(1, int(n) + 1):
+            stream.write("%d hello world\n" % i)
+
+
+def count_words(input_filename, output_filename):
+    counts = collections.Counter()
+    with open(input_filename) as stream:
+        for line in stream:
+            counts.update(line.split())
+    with open(output_filename, 'w') as stream:
+        for word, count in sorted(counts.iteritems()):
+            stream.write("%7d %s\n" % (count, word))
+    print "counted %d different words" % len(counts)
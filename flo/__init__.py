@@ -1 +1,7 @@
+import time
+
 VERSION = "1.0.0"
+
+# remember when flo was first imported so that `flo --profile-startup`
+# can report how long it takes to get to the point of running a command
+START_TIME = time.time()
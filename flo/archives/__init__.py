@@ -0,0 +1,17 @@
+from .objects import ObjectStore
+from .codecs import CODECS, DEFAULT_CODEC, get_codec
+from .tar import write as write_tar, extract as extract_tar, \
+    list_members, read_index, index_path
+
+
+def format_size(n_bytes):
+    """Format a number of bytes for humans"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n_bytes < 1024:
+            break
+        n_bytes /= 1024.0
+    else:
+        unit = 'TB'
+    if unit == 'B':
+        return "%d B" % n_bytes
+    return "%.1f %s" % (n_bytes, unit)
@@ -0,0 +1,208 @@
+"""The compression codecs for archives. Every codec compresses data in
+independent frames that are simply concatenated, which makes it
+possible to compress an archive on several threads at once and to
+decompress part of an archive without reading everything before it.
+"""
+import zlib
+import bz2
+
+from ..exceptions import CommandLineException
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULT_CODEC = 'gzip'
+
+
+class UnknownCodec(CommandLineException):
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        if self.name in OPTIONAL_PACKAGES:
+            return "Codec '%s' requires `pip install %s`" % (
+                self.name, OPTIONAL_PACKAGES[self.name],
+            )
+        return "Unknown codec '%s'; choose one of %s" % (
+            self.name, ', '.join(sorted(CODECS)),
+        )
+
+
+class InvalidLevel(CommandLineException):
+    def __init__(self, codec, level):
+        self.codec = codec
+        self.level = level
+
+    def __str__(self):
+        return "The %s codec supports levels %d to %d, not %s" % (
+            self.codec.name, self.codec.min_level, self.codec.max_level,
+            self.level,
+        )
+
+
+class FrameReader(object):
+    """Read the decompressed contents of `fileobj`, which consists of any
+    number of concatenated frames. `new_decompressor` creates a
+    zlib-like decompressor that puts whatever follows the end of its
+    frame in `unused_data`.
+    """
+
+    def __init__(self, fileobj, new_decompressor, block_size=2**16):
+        self.fileobj = fileobj
+        self.new_decompressor = new_decompressor
+        self.block_size = block_size
+        self.decompressor = new_decompressor()
+        self.buffer = ''
+        self.position = 0
+
+        # whether the decompressor has not decompressed anything yet
+        self._fresh = True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) - self.position < size:
+            data = self.fileobj.read(self.block_size)
+            if not data:
+                break
+            chunks = [self.buffer[self.position:]]
+            while data:
+                try:
+                    chunks.append(self.decompressor.decompress(data))
+                except EOFError:
+                    # bz2 decompressors refuse any data after the end
+                    # of their frame. when a frame ends exactly at the
+                    # end of a block, this is the only sign of it
+                    if self._fresh:
+                        raise
+                    self._new_frame()
+                    continue
+                self._fresh = False
+                data = self.decompressor.unused_data
+                if data:
+                    self._new_frame()
+            self.buffer, self.position = ''.join(chunks), 0
+        if size < 0:
+            size = len(self.buffer) - self.position
+        result = self.buffer[self.position:self.position + size]
+        self.position += len(result)
+        return result
+
+    def _new_frame(self):
+        self.decompressor = self.new_decompressor()
+        self._fresh = True
+
+
+class Codec(object):
+    """Compress and decompress frames of archives"""
+
+    name = None
+    extension = None
+    min_level = 1
+    max_level = 9
+    default_level = None
+
+    # the exceptions that are raised for corrupt data
+    errors = ()
+
+    def validate_level(self, level):
+        """Make sure `level` is supported and return it, or the default"""
+        if level is None:
+            return self.default_level
+        if not self.min_level <= level <= self.max_level:
+            raise InvalidLevel(self, level)
+        return level
+
+    def compress(self, data, level=None):
+        """Compress `data` into a complete, independent frame"""
+        raise NotImplementedError("Must implement compress for child classes")
+
+    def reader(self, fileobj):
+        """A file-like object that reads the decompressed `fileobj`"""
+        raise NotImplementedError("Must implement reader for child classes")
+
+
+class GzipCodec(Codec):
+    name = 'gzip'
+    extension = '.tar.gz'
+    default_level = 6
+    errors = (zlib.error,)
+
+    # this makes zlib read and write gzip headers
+    wbits = 16 + zlib.MAX_WBITS
+
+    def compress(self, data, level=None):
+        compressor = zlib.compressobj(
+            self.validate_level(level), zlib.DEFLATED, self.wbits,
+        )
+        return compressor.compress(data) + compressor.flush()
+
+    def reader(self, fileobj):
+        return FrameReader(fileobj, lambda: zlib.decompressobj(self.wbits))
+
+
+class Bzip2Codec(Codec):
+    name = 'bz2'
+    extension = '.tar.bz2'
+    default_level = 9
+    errors = (IOError, EOFError)
+
+    def compress(self, data, level=None):
+        return bz2.compress(data, self.validate_level(level))
+
+    def reader(self, fileobj):
+        return FrameReader(fileobj, bz2.BZ2Decompressor)
+
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+    extension = '.tar.zst'
+    max_level = 22
+    default_level = 3
+
+    @property
+    def errors(self):
+        return (zstandard.ZstdError,)
+
+    def compress(self, data, level=None):
+        compressor = zstandard.ZstdCompressor(level=self.validate_level(level))
+        return compressor.compress(data)
+
+    def reader(self, fileobj):
+        return zstandard.ZstdDecompressor().stream_reader(
+            fileobj, read_across_frames=True,
+        )
+
+
+CODECS = {
+    'gzip': GzipCodec(),
+    'bz2': Bzip2Codec(),
+}
+if zstandard is not None:
+    CODECS['zstd'] = ZstdCodec()
+
+# packages that provide the optional codecs, for error messages
+OPTIONAL_PACKAGES = {
+    'zstd': 'zstandard',
+}
+
+
+def get_codec(name=None):
+    """Get the codec called `name`"""
+    name = name or DEFAULT_CODEC
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise UnknownCodec(name)
+
+
+def codec_for(archive):
+    """Get the codec of `archive` from its extension"""
+    for codec in CODECS.itervalues():
+        if archive.endswith(codec.extension):
+            return codec
+    if archive.endswith(ZstdCodec.extension):
+        raise UnknownCodec(ZstdCodec.name)
+    raise CommandLineException(
+        "Can not tell how '%s' is compressed" % archive
+    )
@@ -0,0 +1,164 @@
+"""A content-addressed store for incremental archives. The contents of
+every file are stored once in .flo/objects, keyed by their state
+(the same hash that flo uses to tell whether a resource changed), and
+every snapshot of the workflow is a small manifest that maps the
+files of the workflow to these objects.
+"""
+import os
+import json
+import time
+import shutil
+import tempfile
+
+from ..resources import hashes
+from ..resources.file_system import FileSystem, stat_signature
+
+MANIFEST_VERSION = 1
+
+
+class ObjectStore(object):
+    """Store file contents in `path` keyed by their full-fingerprint state.
+
+    The state of every file that has been stored or restored is
+    remembered in an index along with its stat signature so that
+    files that have not changed since then are not hashed again.
+    """
+
+    def __init__(self, path, root_directory):
+        self.path = path
+        self.root_directory = root_directory
+        self.index_path = os.path.join(path, 'index.json')
+        try:
+            with open(self.index_path) as stream:
+                self.index = json.load(stream)
+        except (IOError, ValueError):
+            self.index = {}
+
+    def object_path(self, state):
+        """The path where the contents of a file with `state` are stored"""
+        fingerprint, algorithm = hashes.parse_state(state)
+        hexdigest = state.split(':')[-1]
+        return os.path.join(self.path, algorithm, hexdigest[:2],
+                            hexdigest[2:])
+
+    def abs_path(self, filename):
+        return os.path.join(self.root_directory, filename)
+
+    def get_state(self, filename, algorithm=None):
+        """Get the full-fingerprint state of `filename` with `algorithm`,
+        only hashing the file if it changed since it was last indexed.
+        """
+        abs_filename = self.abs_path(filename)
+        stat = os.stat(abs_filename)
+        signature = None
+        if time.time() - stat.st_mtime >= FileSystem.racy_interval:
+            signature = stat_signature(stat)
+        record = self.index.get(filename)
+        if (signature is not None and record and record[0] == signature and
+                hashes.parse_state(record[1])[1] ==
+                (algorithm or hashes.DEFAULT_ALGORITHM)):
+            return record[1]
+        with open(abs_filename) as stream:
+            state = hashes.stream_state(stream, algorithm)
+        self.index[filename] = [signature, state]
+        return state
+
+    def add(self, filename, state):
+        """Copy `filename` into the store unless its contents (`state`) are
+        already there. Returns the number of bytes that were copied.
+        """
+        object_path = self.object_path(state)
+        if os.path.exists(object_path):
+            return 0
+
+        # files are added from several threads at once and files with
+        # the same contents can be added at the same time
+        directory = os.path.dirname(object_path)
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        os.close(fd)
+        shutil.copyfile(self.abs_path(filename), temp_path)
+        os.rename(temp_path, object_path)
+        return os.path.getsize(object_path)
+
+    def write_manifest(self, manifest_path, filenames, known_states=None,
+                       map_func=map):
+        """Store every file in `filenames` (relative to the root directory)
+        and write a manifest of them to `manifest_path`. `known_states`
+        are full-fingerprint states that have already been calculated
+        by flo, keyed by filename, which saves hashing those files.
+        `map_func` is used to hash and store the files in parallel.
+        Returns the number of new objects and the bytes they take up.
+        """
+        known_states = known_states or {}
+
+        def store(filename):
+            state = known_states.get(filename) or self.get_state(filename)
+            mode = os.stat(self.abs_path(filename)).st_mode & 0777
+            return filename, state, mode, self.add(filename, state)
+
+        manifest = {'version': MANIFEST_VERSION, 'files': {}}
+        n_objects = n_bytes = 0
+        for filename, state, mode, size in map_func(store, filenames):
+            manifest['files'][filename] = {'state': state, 'mode': mode}
+            if size:
+                n_objects += 1
+                n_bytes += size
+
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'w') as stream:
+            json.dump(manifest, stream, indent=1, sort_keys=True)
+        os.rename(temp_path, manifest_path)
+        self.save_index()
+        return n_objects, n_bytes
+
+    def restore_manifest(self, manifest_path):
+        """Restore every file in the manifest at `manifest_path` whose
+        contents differ from what is on disk now. Returns the number of
+        restored and unchanged files.
+        """
+        with open(manifest_path) as stream:
+            manifest = json.load(stream)
+        n_restored = n_unchanged = 0
+        for filename, entry in sorted(manifest['files'].iteritems()):
+            state = entry['state']
+            algorithm = hashes.parse_state(state)[1]
+            abs_filename = self.abs_path(filename)
+            if (os.path.isfile(abs_filename) and
+                    self.get_state(filename, algorithm) == state):
+                n_unchanged += 1
+                continue
+            directory = os.path.dirname(abs_filename)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_path = "%s.%d.tmp" % (abs_filename, os.getpid())
+            shutil.copyfile(self.object_path(state), temp_path)
+            os.chmod(temp_path, entry['mode'])
+            os.rename(temp_path, abs_filename)
+            self.index.pop(filename, None)
+            n_restored += 1
+        self.save_index()
+        return n_restored, n_unchanged
+
+    def list_manifest(self, manifest_path):
+        """List the (filename, size) of every file in the manifest at
+        `manifest_path`
+        """
+        with open(manifest_path) as stream:
+            manifest = json.load(stream)
+        return [
+            (filename, os.path.getsize(self.object_path(entry['state'])))
+            for filename, entry in sorted(manifest['files'].iteritems())
+        ]
+
+    def save_index(self):
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as stream:
+            json.dump(self.index, stream)
+        os.rename(temp_path, self.index_path)
@@ -0,0 +1,394 @@
+"""Write and read compressed tar archives in-process. The tar stream is
+cut into frames that are compressed independently on several threads
+and written to the archive in order, which standard tools read like
+any other compressed tarball.
+"""
+import os
+import json
+import time
+import bisect
+import tarfile
+import collections
+from multiprocessing.pool import ThreadPool
+
+from ..exceptions import CommandLineException
+from .. import colors
+from .codecs import codec_for
+
+INDEX_VERSION = 1
+
+
+class ArchiveError(CommandLineException):
+    def __init__(self, archive, error):
+        self.archive = archive
+        self.error = error
+
+    def __str__(self):
+        return "Could not %s archive '%s': %s" % (
+            self.action, self.archive, self.error,
+        )
+
+
+class WriteError(ArchiveError):
+    action = 'write'
+
+
+class ReadError(ArchiveError):
+    action = 'restore'
+
+
+class FrameWriter(object):
+    """A file-like object that compresses everything that is written to
+    it in frames of `frame_size` bytes on `threads` threads and writes
+    the frames to `fileobj` in order. At most two frames per thread are
+    held in memory at any time.
+    """
+
+    def __init__(self, fileobj, codec, level=None, threads=1,
+                 frame_size=2**22, progress=None):
+        self.fileobj = fileobj
+        self.codec = codec
+        self.level = codec.validate_level(level)
+        self.threads = threads
+        self.frame_size = frame_size
+        self.progress = progress
+        self.pool = ThreadPool(threads) if threads > 1 else None
+        self._pending = collections.deque()
+        self._buffer = []
+        self._buffered = 0
+
+        # the number of uncompressed bytes written so far and the
+        # (uncompressed offset, compressed offset) of every frame
+        self.offset = 0
+        self.compressed_offset = 0
+        self.frames = []
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self.offset += len(data)
+        if self._buffered >= self.frame_size:
+            self.end_frame()
+
+    def tell(self):
+        return self.offset
+
+    def end_frame(self):
+        """Compress everything that was written since the last frame"""
+        if not self._buffered:
+            return
+        data = ''.join(self._buffer)
+        start = self.offset - self._buffered
+        self._buffer, self._buffered = [], 0
+        if self.pool is None:
+            self._write_frame(start, self.codec.compress(data, self.level))
+        else:
+            self._pending.append((start, self.pool.apply_async(
+                self.codec.compress, (data, self.level),
+            )))
+            self._write_frames(2 * self.threads)
+
+    def _write_frames(self, n_pending):
+        """Write finished frames until at most `n_pending` are left"""
+        while len(self._pending) > n_pending:
+            start, result = self._pending.popleft()
+            self._write_frame(start, result.get())
+
+    def _write_frame(self, start, frame):
+        self.frames.append((start, self.compressed_offset))
+        self.fileobj.write(frame)
+        self.compressed_offset += len(frame)
+        if self.progress is not None:
+            self.progress(start)
+
+    def close(self):
+        try:
+            self.end_frame()
+            self._write_frames(0)
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool = None
+
+
+class Progress(object):
+    """Report how far along reading or writing `total` bytes is, at most
+    every `interval` seconds, on a single line of `logger`.
+    """
+
+    interval = 0.5
+
+    def __init__(self, logger, verb, total):
+        self.logger = logger
+        self.verb = verb
+        self.total = total
+        self.start = time.time()
+        self.reported = self.start
+
+    def __call__(self, done):
+        now = time.time()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            self.logger.write("\r%s %3d%% (%s)" % (
+                self.verb, 100 * done / max(self.total, 1),
+                self.throughput(done),
+            ))
+
+    def throughput(self, done):
+        megabytes = done / 2.0**20
+        return "%.1f MB, %.1f MB/s" % (
+            megabytes, megabytes / max(time.time() - self.start, 1e-3),
+        )
+
+    def finish(self, done, message):
+        """Replace the progress line with `message`"""
+        self.logger.write("\r%s (%s)\n" % (message, self.throughput(done)))
+
+
+def index_path(archive):
+    """The path of the index of `archive`"""
+    return archive + '.index'
+
+
+def read_index(archive):
+    """Read the index of `archive`, or None if it does not have one"""
+    try:
+        with open(index_path(archive)) as stream:
+            return json.load(stream)
+    except IOError:
+        return None
+
+
+def write(archive, root_directory, filenames, codec, level=None, threads=1,
+          logger=None, tasks=None):
+    """Write the `filenames` (relative to `root_directory`) to the tar
+    `archive`, compressed with `codec`. The archive only appears once it
+    is complete.
+
+    An index of the archive is written next to it, which records the
+    offset of every member and of every compressed frame so that
+    members can be extracted without decompressing everything before
+    them. `tasks` are stored in the index as they are.
+    """
+    level = codec.validate_level(level)
+    progress = Progress(logger, "archiving", 0) if logger else None
+
+    # the index maps every file to the [offset, size, mode, mtime] of
+    # its contents in the uncompressed tar stream and every directory
+    # to its [mode, mtime]
+    members = {}
+    directories = {}
+    temp_path = archive + '.tmp'
+    temp_index_path = index_path(archive) + '.tmp'
+    try:
+        if progress:
+            for filename in filenames:
+                path = os.path.join(root_directory, filename)
+                if os.path.isfile(path):
+                    progress.total += os.path.getsize(path)
+        with open(temp_path, 'wb') as stream:
+            writer = FrameWriter(stream, codec, level, threads,
+                                 progress=progress)
+            try:
+                tar = tarfile.open(fileobj=writer, mode='w',
+                                   dereference=True)
+                for filename in filenames:
+                    tar.add(os.path.join(root_directory, filename),
+                            arcname=filename, recursive=False)
+                    member = tar.members[-1]
+                    if member.isdir():
+                        directories[member.name] = [member.mode, member.mtime]
+                        continue
+                    blocks = -(-member.size // tarfile.BLOCKSIZE)
+                    members[member.name] = [
+                        tar.offset - blocks * tarfile.BLOCKSIZE,
+                        member.size, member.mode, member.mtime,
+                    ]
+                tar.close()
+            finally:
+                writer.close()
+        with open(temp_index_path, 'w') as stream:
+            json.dump({
+                'version': INDEX_VERSION,
+                'codec': codec.name,
+                'frames': writer.frames,
+                'members': members,
+                'directories': directories,
+                'tasks': tasks or {},
+            }, stream, sort_keys=True)
+        os.rename(temp_index_path, index_path(archive))
+        os.rename(temp_path, archive)
+    except (IOError, OSError, tarfile.TarError), error:
+        for path in (temp_path, temp_index_path):
+            if os.path.exists(path):
+                os.remove(path)
+        raise WriteError(archive, error)
+    if progress:
+        progress.finish(writer.offset, "archived %d files in %s" % (
+            len(members),
+            colors.green(os.path.relpath(archive, root_directory)),
+        ))
+
+
+def _is_outside(path):
+    path = os.path.normpath(path)
+    return os.path.isabs(path) or path == '..' or path.startswith('../')
+
+
+def _check_member(member):
+    """Make sure that extracting `member` can not write outside of the
+    directory that the archive is extracted in
+    """
+    if _is_outside(member.name):
+        raise tarfile.TarError("unsafe path '%s'" % member.name)
+    if member.issym():
+        target = os.path.join(os.path.dirname(member.name), member.linkname)
+    elif member.islnk():
+        target = member.linkname
+    else:
+        return
+    if _is_outside(target):
+        raise tarfile.TarError("unsafe link '%s' -> '%s'" % (
+            member.name, member.linkname,
+        ))
+
+
+class RandomAccessReader(object):
+    """Read the uncompressed tar stream of an archive from any offset
+    by decompressing from the start of the frame that contains it.
+    Reading members in order continues in the current frame rather
+    than starting over.
+    """
+
+    def __init__(self, stream, codec, frames):
+        self.stream = stream
+        self.codec = codec
+        self.frames = frames
+        self.frame_offsets = [offset for offset, compressed in frames]
+        self.reader = None
+        self.position = None
+
+    def frame(self, offset):
+        """The index of the frame that contains `offset`"""
+        return bisect.bisect_right(self.frame_offsets, offset) - 1
+
+    def seek(self, offset):
+        if (self.reader is None or offset < self.position or
+                self.frame(offset) > self.frame(self.position)):
+            self.position, compressed_offset = self.frames[self.frame(offset)]
+            self.stream.seek(compressed_offset)
+            self.reader = self.codec.reader(self.stream)
+        while self.position < offset:
+            self.read(min(offset - self.position, 2**20))
+
+    def read(self, size):
+        data = self.reader.read(size)
+        if len(data) < size:
+            raise tarfile.ReadError("unexpected end of data")
+        self.position += len(data)
+        return data
+
+
+def _extract_indexed(reader, root_directory, name, entry):
+    """Extract the member `name` with index `entry` from `reader`"""
+    offset, size, mode, mtime = entry
+    if _is_outside(name):
+        raise tarfile.TarError("unsafe path '%s'" % name)
+    path = os.path.join(root_directory, name)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    temp_path = path + '.tmp'
+    reader.seek(offset)
+    with open(temp_path, 'wb') as stream:
+        while size > 0:
+            data = reader.read(min(size, 2**20))
+            stream.write(data)
+            size -= len(data)
+    os.chmod(temp_path, mode)
+    os.utime(temp_path, (mtime, mtime))
+    os.rename(temp_path, path)
+
+
+def _extract_indexed_directory(root_directory, name, entry):
+    """Create the directory `name` with index `entry`"""
+    mode = entry[0]
+    if _is_outside(name):
+        raise tarfile.TarError("unsafe path '%s'" % name)
+    path = os.path.join(root_directory, name)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    os.chmod(path, mode)
+
+
+def extract(archive, root_directory, select=None, logger=None):
+    """Extract the files in `archive` into `root_directory`. Only the
+    members whose names `select` returns True for are extracted if it
+    is given, which only decompresses the frames that contain them
+    when the archive has an index. Returns the number of files that
+    were extracted.
+    """
+    codec = codec_for(archive)
+    index = read_index(archive) if select else None
+    progress = Progress(logger, "restoring", 0) if logger else None
+    n_files = done = 0
+    try:
+        with open(archive, 'rb') as stream:
+            if index is not None:
+                reader = RandomAccessReader(stream, codec, index['frames'])
+                for name, entry in sorted(
+                        index.get('directories', {}).iteritems()):
+                    if select(name):
+                        _extract_indexed_directory(root_directory, name,
+                                                   entry)
+                entries = sorted(
+                    (entry, name)
+                    for name, entry in index['members'].iteritems()
+                    if select(name)
+                )
+                for entry, name in entries:
+                    _extract_indexed(reader, root_directory, name, entry)
+                    done += entry[1]
+                    n_files += 1
+            else:
+                done = os.fstat(stream.fileno()).st_size
+                if progress:
+                    progress.total = done
+                tar = tarfile.open(fileobj=codec.reader(stream), mode='r|')
+                for member in tar:
+                    if select and not select(member.name):
+                        continue
+                    _check_member(member)
+                    tar.extract(member, root_directory)
+                    n_files += member.isfile()
+                    if progress:
+                        progress(stream.tell())
+                tar.close()
+    except (IOError, OSError, tarfile.TarError) + codec.errors, error:
+        raise ReadError(archive, error)
+    if progress:
+        progress.finish(done, "restored %d files from %s" % (
+            n_files, colors.green(os.path.relpath(archive, root_directory)),
+        ))
+    return n_files
+
+
+def list_members(archive):
+    """List the (name, size) of every file in `archive`, which is instant
+    for archives with an index
+    """
+    index = read_index(archive)
+    if index is not None:
+        return sorted(
+            (name, entry[1]) for name, entry in index['members'].iteritems()
+        )
+    codec = codec_for(archive)
+    try:
+        with open(archive, 'rb') as stream:
+            tar = tarfile.open(fileobj=codec.reader(stream), mode='r|')
+            members = [(member.name, member.size)
+                       for member in tar if member.isfile()]
+            tar.close()
+    except (IOError, OSError, tarfile.TarError) + codec.errors, error:
+        raise ReadError(archive, error)
+    return sorted(members)
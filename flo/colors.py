@@ -30,6 +30,9 @@ bold_white = _wrap_with('37', True)
 
 
 # regular expression to omit colorcodes
+COLOR_CODE_REGEX = re.compile("\033\[(1;)?[\d]+m")
+
+
 def colorless(text):
     """Remove color from the text"""
-    return re.sub("\033\[(1;)?[\d]+m", '', text)
+    return COLOR_CODE_REGEX.sub('', text)
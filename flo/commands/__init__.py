@@ -3,47 +3,111 @@ from base.BaseCommand.
 """
 import sys
 import os
+import time
+import shlex
 import argparse
-import glob
 from importlib import import_module
 
 from ..exceptions import CommandLineException
-from .base import BaseCommand
-from . import run, clean, archive, status
 from .. import colors
+from .. import START_TIME
 
-# NOTE: as of commit 54297065861b95922f1d26b892a63da33052a138, we
-# imported these modules dynamically but this is rather slow for
-# autocompletion
-COMMAND_MODULES = [run, clean, archive, status]
+# the name and help text of every subcommand. the module for each
+# subcommand is only imported, and its options (many of which are
+# derived from flo.yaml) are only added, when that subcommand is
+# selected on the command line. this keeps autocompletion responsive.
+SUBCOMMANDS = [
+    ('run', "Run the task workflow."),
+    ('clean', (
+        "Remove all `creates` targets defined in workflow. If a `task_id` is "
+        "specified, only remove that target."
+    )),
+    ('archive', "Create and restore backup archives of workflows."),
+    ('status', (
+        "Check the status of the current workflow "
+        "to see which tasks, if any, are out of sync and would be run."
+    )),
+]
 
+# modules that take a while to import and that should only be imported
+# when they are actually needed. --profile-startup reports whether any
+# of these have been imported.
+SLOW_MODULES = [
+    'networkx', 'smtplib', 'email', 'BaseHTTPServer', 'SocketServer',
+]
 
-def get_command_line_parser():
+
+def get_selected_subcommand(argv=None):
+    """Find the subcommand on the command line, or the one that is being
+    tab completed by argcomplete. Returns None if there is not one.
+    """
+    if argv is None:
+        if '_ARGCOMPLETE' in os.environ:
+            comp_line = os.environ.get('COMP_LINE', '')
+            comp_point = int(os.environ.get('COMP_POINT', len(comp_line)))
+            try:
+                argv = shlex.split(comp_line[:comp_point])[1:]
+            except ValueError:
+                argv = comp_line[:comp_point].split()[1:]
+        else:
+            argv = sys.argv[1:]
+    for arg in argv:
+        if not arg.startswith('-'):
+            return arg
+
+
+def get_command_line_parser(argv=None):
     """Public function for creating a parser to execute all of the commands
     in this sub-package.
     """
     command_line_parser = argparse.ArgumentParser(
         description="Execute data workflows defined in flo.yaml files",
     )
+    command_line_parser.add_argument(
+        '--profile-startup',
+        action="store_true",
+        help=(
+            "Report how long flo takes to start up and which slow modules "
+            "it imports instead of running a subcommand."
+        ),
+    )
     subcommand_creator = command_line_parser.add_subparsers(
         title='SUBCOMMANDS',
     )
-    for command_module in COMMAND_MODULES:
-        command = command_module.Command(subcommand_creator)
-
-        # this sets a default value for the command "option" so
-        # that, when this Command is selected by argparse from the
-        # command line, we know which comman instance it
-        # corresponds with. See run_subcommand function below.
-        command.option_parser.set_defaults(command=command)
+    selected = get_selected_subcommand(argv)
+    for name, help_text in SUBCOMMANDS:
+        option_parser = subcommand_creator.add_parser(
+            name, help=help_text, description=help_text,
+        )
+        if name == selected:
+            command_module = import_module('.' + name, __name__)
+            command = command_module.Command(option_parser)
+
+            # this sets a default value for the command "option" so
+            # that, when this Command is selected by argparse from the
+            # command line, we know which comman instance it
+            # corresponds with. See run_subcommand function below.
+            option_parser.set_defaults(command=command)
     return command_line_parser
 
 
+def profile_startup():
+    """Report how long it took to import flo and parse the command line"""
+    print("started up in %.3f s" % (time.time() - START_TIME))
+    print("imported %d modules" % len(sys.modules))
+    slow_modules = [module for module in SLOW_MODULES
+                    if module in sys.modules]
+    print("slow modules imported: %s" % (', '.join(slow_modules) or 'none'))
+
+
 def run_subcommand(args):
     """This function runs the command that is selected by this particular
     subcommand parser.
     """
     command = args.__dict__.pop("command")
+    if args.__dict__.pop("profile_startup"):
+        profile_startup()
+        return
     try:
         command.execute(**args.__dict__)
     except CommandLineException, error:
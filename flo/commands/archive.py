@@ -1,22 +1,36 @@
 import os
 import glob
+import multiprocessing
 
-from .base import BaseCommand
+from .base import BaseCommand, LazyChoices
 from ..parser import find_config_path
 from ..tasks.graph import TaskGraph
+from .. import archives
 from ..exceptions import ConfigurationNotFound
 
 
 class Command(BaseCommand):
-    help_text = "Create and restore backup archives of workflows."
 
-    def execute(self, restore=False, exclude_internals=False, **kwargs):
+    def execute(self, restore=False, exclude_internals=False,
+                incremental=False, codec=None, level=None, jobs=None,
+                list_archive=None, task_id=None, **kwargs):
         super(Command, self).execute(**kwargs)
+        if jobs is not None and jobs < 1:
+            self.option_parser.error("--jobs must be at least 1")
+        if task_id is not None and not restore:
+            self.option_parser.error("TASK_ID can only be used with --restore")
 
-        if restore:
-            self.task_graph.restore_archive(restore)
+        if list_archive:
+            self.task_graph.list_archive(list_archive)
+        elif restore:
+            self.task_graph.restore_archive(restore, task_id=task_id)
+        elif incremental:
+            self.task_graph.write_snapshot(exclude_internals=exclude_internals)
         else:
-            self.task_graph.write_archive(exclude_internals=exclude_internals)
+            self.task_graph.write_archive(
+                exclude_internals=exclude_internals, codec=codec,
+                level=level, jobs=jobs or multiprocessing.cpu_count(),
+            )
 
     @property
     def available_archives(self):
@@ -29,7 +43,10 @@ class Command(BaseCommand):
         abs_project_root = os.path.dirname(config_path)
         abs_archive_dir = os.path.join(abs_project_root, TaskGraph.archive_dir)
         abs_archives = glob.glob(os.path.join(abs_archive_dir, "*"))
-        return [os.path.relpath(a, abs_project_root) for a in abs_archives]
+
+        # indexes and unfinished archives can not be restored
+        return [os.path.relpath(a, abs_project_root) for a in abs_archives
+                if not a.endswith(('.index', '.tmp'))]
 
     def available_archives_completer(self, prefix, parsed_args, **kwargs):
         self.config = parsed_args.config
@@ -43,6 +60,36 @@ class Command(BaseCommand):
             action="store_true",
             help="Exclude internals in the .flo/ directory from archive",
         )
+        self.option_parser.add_argument(
+            '--incremental',
+            action="store_true",
+            help=(
+                "Only store files that changed since the last incremental "
+                "archive."
+            ),
+        )
+        self.option_parser.add_argument(
+            '--codec',
+            metavar='CODEC',
+            help=(
+                "Compress the archive with CODEC (%s; default %s)." % (
+                    ', '.join(sorted(archives.CODECS)),
+                    archives.DEFAULT_CODEC,
+                )
+            ),
+        )
+        self.option_parser.add_argument(
+            '--level',
+            type=int,
+            metavar='N',
+            help="Compression level, which depends on the codec.",
+        )
+        self.option_parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            metavar='N',
+            help="Compress on N threads (default: one per CPU).",
+        )
 
         # this uses a custom completer to properly enable
         # autocompletion when a particular configuration file is
@@ -51,7 +98,7 @@ class Command(BaseCommand):
         option = self.option_parser.add_argument(
             '--restore',
             metavar='ARCHIVE_PATH',
-            choices=self.available_archives,
+            choices=LazyChoices(lambda: self.available_archives),
             default=False,
             type=str,
             nargs='?',
@@ -61,3 +108,15 @@ class Command(BaseCommand):
             ),
         )
         option.completer = self.available_archives_completer
+        option = self.option_parser.add_argument(
+            '--list',
+            dest='list_archive',
+            metavar='ARCHIVE_PATH',
+            choices=LazyChoices(lambda: self.available_archives),
+            type=str,
+            help="List the files in an archive.",
+        )
+        option.completer = self.available_archives_completer
+        self.add_task_id_option(
+            "Only restore the files that this task creates (with --restore)."
+        )
@@ -2,28 +2,35 @@ from ..parser import load_task_graph, get_task_kwargs_list
 from ..exceptions import ConfigurationNotFound, YamlError
 
 
+class LazyChoices(object):
+    """The `choices` for an argparse option that are only computed (by
+    calling `func`) when argparse actually checks a value. This avoids
+    parsing flo.yaml just to build the command line parser.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __contains__(self, item):
+        return item in self.func()
+
+    def __iter__(self):
+        return iter(self.func())
+
+
 class BaseCommand(object):
-    help_text = ''
 
-    def __init__(self, subcommand_creator):
+    def __init__(self, option_parser):
 
         # keep a local copy of the config file which is useful during
         # autocompletion
         self.config = None
+        self._available_task_ids = {}
 
         # set up the subcommand options
-        self.subcommand_creator = subcommand_creator
-        self.option_parser = self.subcommand_creator.add_parser(
-            self.get_command_name(),
-            help=self.help_text,
-            description=self.help_text,
-        )
+        self.option_parser = option_parser
         self.add_command_line_options()
 
-    def get_command_name(self):
-        """The command name defaults to the name of the module."""
-        return self.__module__.rsplit('.', 1)[1]
-
     def add_command_line_options(self):
         self.option_parser.add_argument(
             '-c', '--config',
@@ -35,10 +42,10 @@ class BaseCommand(object):
         self.config = config
         self.task_graph = load_task_graph(config=config)
 
-    # this is a performance optimization to make it possible to use
-    # the flo.yaml file to inform useful *and responsive* tab
-    # completion on the command line _task_kwargs_list is used as a
-    # local cache that is loaded once and inherited by all subclasses.
+    # this makes it possible to use the flo.yaml file to inform
+    # useful *and responsive* tab completion on the command line. the
+    # parsed flo.yaml is cached (see parser.load_config) and the task
+    # ids are only calculated once per config file.
     @property
     def task_kwargs_list(self):
         try:
@@ -48,13 +55,22 @@ class BaseCommand(object):
 
     @property
     def available_task_ids(self):
+        try:
+            return self._available_task_ids[self.config]
+        except KeyError:
+            pass
         task_ids = []
         for task_kwargs in self.task_kwargs_list:
             task_id = task_kwargs.get('alias') or task_kwargs.get('creates')
             task_ids.append(task_id)
         task_ids.sort()
+        self._available_task_ids[self.config] = task_ids
         return task_ids
 
+    @property
+    def task_id_choices(self):
+        return LazyChoices(lambda: self.available_task_ids)
+
     def task_ids_completer(self, prefix, parsed_args, **kwargs):
         # this custom completer makes autocompletion work properly
         # when an alternative configuration file has been specified
@@ -78,7 +94,7 @@ class BaseCommand(object):
             'task_id',
             metavar='TASK_ID',
             type=str,
-            choices=self.available_task_ids,
+            choices=self.task_id_choices,
             nargs='?',
             help=help_text,
         )
@@ -1,15 +1,15 @@
+import multiprocessing
+
 from .base import BaseCommand
 
 
 class Command(BaseCommand):
-    help_text = (
-        "Remove all `creates` targets defined in workflow. If a `task_id` is "
-        "specified, only remove that target."
-    )
 
     def execute(self, task_id=None, force=False, include_internals=False,
-                **kwargs):
+                jobs=None, **kwargs):
         super(Command, self).execute(**kwargs)
+        if jobs is not None and jobs < 1:
+            self.option_parser.error("--jobs must be at least 1")
         kwargs = {
             'include_internals': include_internals,
         }
@@ -22,7 +22,9 @@ class Command(BaseCommand):
         # print a warning message before removing all tasks. Briefly
         # pause to make sure user sees the message at the top.
         if force or self.task_graph.get_user_clean_confirmation(**kwargs):
-            self.task_graph.clean(**kwargs)
+            self.task_graph.clean(
+                jobs=jobs or multiprocessing.cpu_count(), **kwargs
+            )
 
     def add_command_line_options(self):
         super(Command, self).add_command_line_options()
@@ -36,6 +38,15 @@ class Command(BaseCommand):
             action="store_true",
             help="Remove all files in the .flo/ directory.",
         )
+        self.option_parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            metavar='N',
+            help=(
+                "Remove up to N targets at the same time "
+                "(default: one per CPU)."
+            ),
+        )
         self.add_task_id_option(
             'Specify a particular task to clean rather than all of them.'
         )
@@ -2,12 +2,10 @@ import os
 import sys
 
 from ..exceptions import ShellError, CommandLineException
-from ..notify import notify
 from .base import BaseCommand
 
 
 class Command(BaseCommand):
-    help_text = "Run the task workflow."
 
     def manipulate_task_graph(self, task_id, start_at, skip, only):
 
@@ -37,30 +35,37 @@ class Command(BaseCommand):
             self.task_graph.remove_node_substituting_dependencies(skip)
 
     def inner_execute(self, task_id, start_at, skip, only, force,
-                      mock_run=False):
+                      mock_run=False, jobs=1, verify=False):
+        if jobs < 1:
+            self.option_parser.error("--jobs must be at least 1")
         self.manipulate_task_graph(task_id, start_at, skip, only)
+        self.task_graph.verify_states = verify
 
         # when the workflow is --force'd, this runs all
         # tasks. Otherwise, only runs tasks that are out of sync.
         if force:
-            self.task_graph.run_all(mock_run=mock_run)
+            self.task_graph.run_all(mock_run=mock_run, jobs=jobs)
         else:
-            self.task_graph.run_all_out_of_sync(mock_run=mock_run)
+            self.task_graph.run_all_out_of_sync(mock_run=mock_run, jobs=jobs)
 
         # mark the self.task_graph as completing successfully to send the
         # correct email message
         self.task_graph.successful = True
 
     def execute(self, task_id=None, start_at=None, skip=None, only=None,
-                force=False, notify_emails=None, **kwargs):
+                force=False, jobs=1, verify=False, notify_emails=None,
+                **kwargs):
         super(Command, self).execute(**kwargs)
         try:
-            self.inner_execute(task_id, start_at, skip, only, force)
+            self.inner_execute(task_id, start_at, skip, only, force,
+                               jobs=jobs, verify=verify)
         except CommandLineException:
             raise
         finally:
             if notify_emails:
-                notify(*notify_emails)
+                # smtplib and email are only imported when needed
+                from ..notify import notify
+                notify(self.task_graph, *notify_emails)
 
     def add_common_run_options(self):
         # these options are used by both the `run` and `status` command
@@ -69,12 +74,27 @@ class Command(BaseCommand):
             action="store_true",
             help="Rerun entire workflow, regardless of task state.",
         )
+        self.option_parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            default=1,
+            metavar='N',
+            help='Run up to N independent tasks at the same time.',
+        )
+        self.option_parser.add_argument(
+            '--verify',
+            action="store_true",
+            help=(
+                "Hash the contents of every file rather than trusting "
+                "files whose size and modification time have not changed."
+            ),
+        )
         self.add_task_id_option('Specify a particular task to run.')
         self.add_task_id_argument(
             '--start-at',
             type=str,
             metavar='TASK_ID',
-            choices=self.available_task_ids,
+            choices=self.task_id_choices,
             help=(
                 'Specify a task to start from (run everything downstream, '
                 'ignore everything upstream).'
@@ -84,14 +104,14 @@ class Command(BaseCommand):
             '--skip',
             type=str,
             metavar='TASK_ID',
-            choices=self.available_task_ids,
+            choices=self.task_id_choices,
             help='Skip the specified task and ignore whether it is in sync.',
         )
         self.add_task_id_argument(
             '--only',
             type=str,
             metavar='TASK_ID',
-            choices=self.available_task_ids,
+            choices=self.task_id_choices,
             help='Only run the specified task.',
         )
 
@@ -1,4 +1,6 @@
 import functools
+import collections
+import threading
 
 from .types import FrozenDict
 
@@ -37,3 +39,36 @@ class memoize(object):
     def __get__(self, obj, objtype):
         '''Support instance methods.'''
         return functools.partial(self.__call__, obj)
+
+
+class lru_cache(object):
+    """Decorator. Caches the return values of a function of hashable
+    arguments, keeping only the `maxsize` most recently used values so
+    that the cache does not grow without bound.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+
+    def __call__(self, func):
+        cache = collections.OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            with lock:
+                try:
+                    value = cache.pop(args)
+                except KeyError:
+                    pass
+                else:
+                    cache[args] = value
+                    return value
+            value = func(*args)
+            with lock:
+                cache[args] = value
+                if len(cache) > self.maxsize:
+                    cache.popitem(last=False)
+            return value
+        wrapper.cache = cache
+        return wrapper
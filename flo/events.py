@@ -0,0 +1,31 @@
+"""Task lifecycle events that `flo run` writes to .flo/events.jsonl as
+they happen, so that other processes (like `flo status --serve`) can
+follow the progress of a run without adding any load to it.
+"""
+import os
+import json
+import time
+
+
+class EventLog(object):
+    """Write every event as a json object on its own line. Each run starts
+    a new file that atomically replaces the file of the previous run,
+    which readers notice because the inode of the file changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        temp_path = path + '.tmp'
+        self.stream = open(temp_path, 'w')
+        os.rename(temp_path, path)
+
+    def write(self, event, task=None, **data):
+        data['event'] = event
+        data['time'] = time.time()
+        if task is not None:
+            data['task_id'] = task.id
+        self.stream.write(json.dumps(data, sort_keys=True) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
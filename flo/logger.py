@@ -3,7 +3,13 @@ file, which can be convenient for inspecting long-running jobs and for
 sending notifications with useful content
 """
 
+import os
 import sys
+import re
+import atexit
+import threading
+import contextlib
+import collections
 
 from .colors import colorless
 
@@ -16,17 +22,172 @@ from .colors import colorless
 class Logger(file):
     """Log output to stdout in color and to a log file in plain text.
     """
+
+    # carriage returns and backspaces move the cursor on the current
+    # line of the terminal; newlines finish the current line
+    control_regex = re.compile(r'([\r\b\n])')
+
     def __init__(self, task_graph):
         super(Logger, self).__init__(task_graph.abs_log_path, 'w')
 
+        # the lock makes sure that only one thread writes at a time
+        # and the thread local storage keeps track of any output that
+        # is being held back until a task is complete (see `buffered`)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # the line that is currently being written to the log file and
+        # the position of the cursor on that line (see `render`)
+        self._line = ''
+        self._cursor = 0
+
     def write(self, content):
-        sys.stdout.write(content)
-        sys.stdout.flush()
-        super(Logger, self).write(colorless(content))
+        tail = getattr(self._local, 'tail', None)
+        if tail is not None:
+            tail.write(content)
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            self._write(content)
+        else:
+            buffer.append(content)
+
+    def _write(self, content):
+        with self._lock:
+            sys.stdout.write(content)
+            sys.stdout.flush()
+            super(Logger, self).write(self.render(colorless(content)))
+
+    def render(self, content):
+        """Handle carriage returns and backspaces in `content` the same way
+        that a terminal does (to properly handle progress bars and the
+        like, issue #53) and return the lines that are finished. The
+        unfinished line is kept until it is finished.
+        """
+        if '\r' not in content and '\b' not in content:
+            if self._cursor == len(self._line):
+                # nothing is overwritten in the common case
+                head, newline, tail = content.rpartition('\n')
+                if not newline:
+                    self._line += tail
+                    self._cursor = len(self._line)
+                    return ''
+                lines = self._line + head + newline
+                self._line, self._cursor = tail, len(tail)
+                return lines
+        lines = []
+        line, cursor = self._line, self._cursor
+        for piece in self.control_regex.split(content):
+            if piece == '\n':
+                lines.append(line + '\n')
+                line, cursor = '', 0
+            elif piece == '\r':
+                cursor = 0
+            elif piece == '\b':
+                cursor = max(0, cursor - 1)
+            elif piece:
+                line = line[:cursor] + piece + line[cursor + len(piece):]
+                cursor += len(piece)
+        self._line, self._cursor = line, cursor
+        return ''.join(lines)
+
+    def finish(self):
+        """Write the unfinished line, if any, to the log file"""
+        with self._lock:
+            if self._line and not self.closed:
+                super(Logger, self).write(self._line)
+                self.flush()
+            self._line, self._cursor = '', 0
 
     def info(self, content):
         self.write(content + '\n')
 
+    @contextlib.contextmanager
+    def buffered(self):
+        """Hold back everything that is written from this thread and write
+        it all at once when the block exits. This keeps the output of
+        tasks that run in parallel from being interleaved.
+        """
+        self._local.buffer = []
+        try:
+            yield
+        finally:
+            content = ''.join(self._local.buffer)
+            self._local.buffer = None
+            if content:
+                self._write(content)
+
+    @contextlib.contextmanager
+    def tailed(self, tail):
+        """Also write everything that is written from this thread to the
+        TailBuffer `tail` until the block exits
+        """
+        self._local.tail = tail
+        try:
+            yield tail
+        finally:
+            self._local.tail = None
+
+
+class TailBuffer(object):
+    """Keep the last `max_bytes` (or a little more) of the output that is
+    written to it, which is how the last lines of output of every task
+    are remembered without holding on to all of it.
+    """
+
+    def __init__(self, max_bytes=2**16):
+        self.max_bytes = max_bytes
+        self._chunks = collections.deque()
+        self._size = 0
+        self.truncated = False
+
+    def write(self, content):
+        self._chunks.append(content)
+        self._size += len(content)
+        while self._size - len(self._chunks[0]) >= self.max_bytes:
+            self._size -= len(self._chunks.popleft())
+            self.truncated = True
+
+    def lines(self, n_lines):
+        """The last `n_lines` lines of output as they look in the log"""
+        content = colorless(''.join(self._chunks))
+        if len(content) > self.max_bytes:
+            content = content[-self.max_bytes:]
+            self.truncated = True
+        lines = content.split('\n')
+        if self.truncated:
+            lines = lines[1:]
+        if lines and not lines[-1]:
+            lines.pop()
+        if n_lines <= 0:
+            return []
+        return [line.rsplit('\r', 1)[-1] for line in lines][-n_lines:]
+
+
+def tail(path, n_lines=100, max_bytes=2**20, block_size=2**16):
+    """Read the last `n_lines` lines of the file at `path`. Blocks are read
+    backwards from the end of the file until there are enough lines,
+    and never more than the last `max_bytes` bytes.
+    """
+    if n_lines <= 0:
+        return []
+    blocks, n_newlines = [], 0
+    with open(path, 'rb') as stream:
+        stream.seek(0, os.SEEK_END)
+        end = position = stream.tell()
+        while position > 0 and end - position < max_bytes and \
+                n_newlines <= n_lines:
+            size = min(block_size, position, max_bytes - (end - position))
+            position -= size
+            stream.seek(position)
+            blocks.append(stream.read(size))
+            n_newlines += blocks[-1].count('\n')
+    lines = ''.join(reversed(blocks)).splitlines()
+
+    # the first line is incomplete unless it starts the file
+    if position > 0:
+        lines = lines[1:]
+    return lines[-n_lines:]
+
 
 # _logger is a singleton instance of the logger that is a local cache
 # of the one and only logger instance for all TaskGraphs. This is
@@ -44,4 +205,5 @@ def configure(task_graph):
     if _logger is not None:
         return _logger
     _logger = Logger(task_graph)
+    atexit.register(_logger.finish)
     return _logger
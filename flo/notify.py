@@ -2,10 +2,51 @@ import smtplib
 from email.mime.text import MIMEText
 import socket
 
-from .parser import load_task_graph
+from . import logger
 
 
-def notify(*contact_list):
+def summarize(task_graph):
+    """Summarize the last run of `task_graph` from what its scheduler
+    recorded: how long every task took, which task failed and the last
+    lines of output of the failed task. If no tasks were run, fall back
+    on the last lines of the log.
+    """
+    n_lines = task_graph.notify_lines
+    scheduler = task_graph.scheduler
+    if scheduler is None:
+        text = "the last %d lines of %s\n\n" % (
+            n_lines, task_graph.abs_log_path
+        )
+        text += '"'*80 + "\n\n"
+        text += '\n'.join(logger.tail(
+            task_graph.abs_log_path, n_lines, task_graph.notify_bytes,
+        ))
+        return text
+
+    text = "ran %d tasks, %d were already in sync\n\n" % (
+        len(scheduler.completed) + len(scheduler.failed),
+        len(scheduler.skipped),
+    )
+    for task in scheduler.completed:
+        text += "%12s  %s\n" % (
+            task_graph.duration_string(task_graph.task_durations[task.id]),
+            task.id,
+        )
+    for task in scheduler.failed:
+        text += "%12s  %s\n" % ("FAILED", task.id)
+    if scheduler.error is not None:
+        text += "\n%s\n" % scheduler.error
+    for task in scheduler.failed:
+        text += "\nthe last %d lines of output of %s\n\n" % (
+            n_lines, task.id,
+        )
+        text += '"'*80 + "\n\n"
+        text += '\n'.join(scheduler.failed_output[task].lines(n_lines))
+        text += '\n'
+    return text
+
+
+def notify(task_graph, *contact_list):
     """Send an notification to any email addresses specified in
     contact_list.
     """
@@ -14,23 +55,12 @@ def notify(*contact_list):
 
     # set the subject to notify about success/failure on this
     # particular host
-    task_graph = load_task_graph()
     status = 'FAILED'
     if task_graph.successful:
         status = 'successfully finished'
 
-    # read in the logs for the body of the message
-    # TODO: this reads the ENTIRE log into memory. likely not a good idea.
-    n_lines = 100
-    with open(task_graph.abs_log_path, 'r') as stream:
-        text = "the last %d lines of %s\n\n" % (
-            n_lines, task_graph.abs_log_path
-        )
-        text += '"'*80 + "\n\n"
-        text += '\n'.join(stream.readlines()[-100:])
-
     # fill out the relevant header information
-    msg = MIMEText(text)
+    msg = MIMEText(summarize(task_graph))
     msg['Subject'] = "flo %s on '%s'" % (status, socket.gethostname(), )
     msg['From'] = 'root@localhost'
     msg['To'] = ', '.join(contact_list)
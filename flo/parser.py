@@ -7,10 +7,14 @@ provides a singleton instance of the TaskGraph (often called
 
 import os
 import copy
+import time
+import hashlib
+import cPickle as pickle
 
 import yaml
 
 from . import exceptions
+from . import VERSION
 from .tasks import TaskGraph
 from .decorators import memoize
 
@@ -19,6 +23,20 @@ from .decorators import memoize
 CONFIG_FILENAME = "flo.yaml"
 TASKS_KEY = 'tasks'
 
+# use the much faster C implementation of the YAML loader if libyaml
+# is available
+YAML_LOADER = getattr(yaml, 'CLoader', yaml.Loader)
+
+# the parsed configuration is cached in this directory (relative to
+# the configuration file) to avoid parsing big YAML files every time
+# flo starts, which is particularly important for tab completion
+CONFIG_CACHE_DIR = os.path.join(TaskGraph.internals_path, "config_cache")
+
+# files that were modified less than this many seconds before they were
+# cached are hashed to check whether they have changed, even if their
+# size and modification time are unchanged
+CONFIG_CACHE_RACY_INTERVAL = 1.0
+
 
 def find_config_path(config=None):
     """Recursively decend into parent directories looking for the config
@@ -54,12 +72,14 @@ def find_config_path(config=None):
     return config_path
 
 
-def config_yaml2task_kwargs_list(config_yaml):
+def split_config_yaml(config_yaml):
     """convert the config_yaml iterator into python dictionaries as
     necessary. this makes it possible to have global variables and
     tasks embedded in the YAML under a something with the key
-    TASKS_KEY
+    TASKS_KEY. Returns the global configuration (which is empty if
+    there isn't any) and the list of task dictionaries.
     """
+    global_config = {}
     task_kwargs_list = []
     uses_global_config = False
     for i, yaml_obj in enumerate(config_yaml):
@@ -69,30 +89,116 @@ def config_yaml2task_kwargs_list(config_yaml):
             global_config = copy.deepcopy(yaml_obj)
             del global_config[TASKS_KEY]
 
+            # settings in a task take precedence over the global ones
             for task_data in yaml_obj[TASKS_KEY]:
-                task_data.update(global_config)
-                task_kwargs_list.append(task_data)
+                task_kwargs = dict(global_config)
+                task_kwargs.update(task_data)
+                task_kwargs_list.append(task_kwargs)
         elif not uses_global_config:
             task_kwargs_list.append(yaml_obj)
-    return task_kwargs_list
+    return global_config, task_kwargs_list
+
+
+def parse_config(config_path, contents):
+    """Parse the `contents` of the YAML file at `config_path` into the
+    global configuration and the list of task dictionaries
+    """
+    config_yaml = yaml.load_all(contents, Loader=YAML_LOADER)
+    try:
+        return split_config_yaml(config_yaml)
+    except yaml.constructor.ConstructorError, error:
+        raise exceptions.YamlError(config_path, error)
+
+
+def get_config_cache_path(config_path):
+    return os.path.join(
+        os.path.dirname(config_path),
+        CONFIG_CACHE_DIR,
+        os.path.basename(config_path) + ".pickle",
+    )
+
+
+def read_config_cache(config_path):
+    """Read the cached configuration for `config_path`, if there is one"""
+    try:
+        with open(get_config_cache_path(config_path), 'rb') as stream:
+            cache = pickle.load(stream)
+    except Exception:
+        # a missing, corrupt or incompatible cache can raise just
+        # about anything, in which case the cache is simply ignored
+        return None
+    if (not isinstance(cache, dict) or cache.get('path') != config_path or
+            cache.get('version') != VERSION):
+        return None
+    return cache
+
+
+def write_config_cache(cache):
+    """Store the `cache` for the next time flo is run. The cache is only
+    an optimization, so failing to write it is not an error.
+    """
+    cache_path = get_config_cache_path(cache['path'])
+    temp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    try:
+        if not os.path.exists(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        with open(temp_path, 'wb') as stream:
+            pickle.dump(cache, stream, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, cache_path)
+    except (IOError, OSError):
+        pass
 
 
 @memoize
-def get_task_kwargs_list(config=None):
-    """Get a list of dictionaries that are read from the flo.yaml
-    file and collapse the global variables into each task.
+def load_config(config=None):
+    """Load the flo.yaml file and return its global configuration and the
+    list of task dictionaries.
+
+    The parsed configuration is cached in CONFIG_CACHE_DIR. The cache
+    is used if the size and modification time of the configuration
+    file have not changed or, failing that, if its contents have the
+    same hash as when it was cached.
     """
 
     # get workflow configuration file
     config_path = find_config_path(config=config)
+    stat = os.stat(config_path)
+    cache = read_config_cache(config_path)
+    if (cache is not None and
+            cache['stat'] == (stat.st_size, stat.st_mtime) and
+            cache['cached_at'] - stat.st_mtime >= CONFIG_CACHE_RACY_INTERVAL):
+        return cache['config']
 
     # load the data
+    cached_at = time.time()
     with open(config_path) as stream:
-        config_yaml = yaml.load_all(stream.read())
-    try:
-        return config_yaml2task_kwargs_list(config_yaml)
-    except yaml.constructor.ConstructorError, error:
-        raise exceptions.YamlError(config_path, error)
+        contents = stream.read()
+    content_hash = hashlib.sha1(contents).hexdigest()
+    if cache is not None and cache['hash'] == content_hash:
+        config = cache['config']
+    else:
+        config = parse_config(config_path, contents)
+    write_config_cache({
+        'path': config_path,
+        'version': VERSION,
+        'stat': (stat.st_size, stat.st_mtime),
+        'cached_at': cached_at,
+        'hash': content_hash,
+        'config': config,
+    })
+    return config
+
+
+def get_task_kwargs_list(config=None):
+    """Get a list of dictionaries that are read from the flo.yaml
+    file and collapse the global variables into each task.
+    """
+    return load_config(config=config)[1]
+
+
+def get_global_config(config=None):
+    """Get the dictionary of global variables from the flo.yaml file"""
+    return load_config(config=config)[0]
 
 
 @memoize
@@ -105,4 +211,8 @@ def load_task_graph(config=None):
 
     # convert each task_kwargs into a Task object and add it to the
     # TaskGraph
-    return TaskGraph(config_path, get_task_kwargs_list(config_path))
+    return TaskGraph(
+        config_path,
+        get_task_kwargs_list(config_path),
+        get_global_config(config_path),
+    )
@@ -17,6 +17,14 @@ def get_or_create(task, candidate_list, creates_or_depends):
             except KeyError:
                 resource = FileSystem(task.graph, candidate)
 
+            # the first task that specifies a hash algorithm or
+            # fingerprint for this resource determines how its state
+            # is calculated
+            if resource.hash_algorithm is None:
+                resource.hash_algorithm = task.hash_algorithms.get(candidate)
+            if resource.fingerprint is None:
+                resource.fingerprint = task.fingerprints.get(candidate)
+
             # bind the task to the appropriate data structure
             # depending on whether this task creates this resource or
             # depends on this resource.
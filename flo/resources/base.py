@@ -1,7 +1,7 @@
 """Base resource here
 """
 
-import hashlib
+from . import hashes
 
 
 class BaseResource(object):
@@ -30,6 +30,12 @@ class BaseResource(object):
         self.creates_task = None
         self.depends_tasks = []
 
+        # the algorithm and fingerprint used to calculate the state
+        # of this resource, which are hashes.DEFAULT_ALGORITHM and
+        # hashes.DEFAULT_FINGERPRINT unless a task specifies otherwise
+        self.hash_algorithm = None
+        self.fingerprint = None
+
     def __repr__(self):
         return self.name + ':' + str(id(self))
 
@@ -58,22 +64,18 @@ class BaseResource(object):
         every task"""
         return self.graph.root_directory
 
-    def get_stream_state(self, stream, block_size=2**20):
+    def get_stream_state(self, stream, algorithm=None, fingerprint=None,
+                         block_size=2**20):
         """Read in a stream in relatively small `block_size`s to make sure we
         won't have memory problems on BIG DATA streams.
         http://stackoverflow.com/a/1131255/564709
+
+        A 'sampled' `fingerprint` only reads a few blocks of the stream,
+        which must be seekable.
         """
-        # TODO: this is called relatively frquently and is almost
-        # certainly IO bound. think about optimizing for speed if
-        # necessary by possibly reading random chunks of a stream
-        # instead of the whole darn thing
-        state = hashlib.sha1()
-        while True:
-            data = stream.read(block_size)
-            if not data:
-                break
-            state.update(data)
-        return state.hexdigest()
+        if fingerprint == 'sampled':
+            return hashes.sampled_stream_state(stream, algorithm, block_size)
+        return hashes.stream_state(stream, algorithm, block_size)
 
     def get_previous_state(self):
         """Get the previous state of this resource prior to this run. If the
@@ -81,27 +83,117 @@ class BaseResource(object):
         """
         return self.graph.get_state_from_storage(self.name)
 
+    def get_previous_signature(self):
+        """Get the stat signature of this resource that was stored along with
+        its previous state.
+        """
+        return self.graph.get_signature_from_storage(self.name)
+
     def get_current_state(self):
-        """Get the current state of this resource. If the resource does
-        not exist, throw an error.
+        """Get the current state of this resource. The state is calculated
+        at most once per flo run and cached on the graph until
+        `invalidate_state` is called, which avoids rehashing large
+        files every time a task checks whether it is in sync.
+        """
+        return self._get_current_record()[0]
+
+    def get_current_signature(self):
+        """Get the current stat signature of this resource, if it has one"""
+        return self._get_current_record()[1]
+
+    def _get_current_record(self):
+        try:
+            return self.graph.current_states[self.name]
+        except KeyError:
+            pass
+
+        # much like make, trust that the resource has not changed if
+        # its stat signature is the same as last time. this avoids
+        # reading the entire contents of large files to hash them.
+        # the previous state can only be reused if it was calculated
+        # in the same way, though.
+        signature = self.calculate_signature()
+        previous_state = self.get_previous_state()
+        if (signature is not None and not self.graph.verify_states and
+                signature == self.get_previous_signature() and
+                self.same_hash_method(previous_state)):
+            state = previous_state
+        else:
+            state = self.calculate_current_state()
+        record = (state, signature)
+        self.graph.current_states[self.name] = record
+        return record
+
+    def calculate_signature(self):
+        """Calculate an inexpensive signature of this resource (for example,
+        its size and modification time) that changes whenever the
+        resource changes. Resources without a signature return None
+        and are always hashed.
+        """
+        return None
 
-        This method must be overwritten by any child classes.
+    @property
+    def hash_method(self):
+        """The (fingerprint, algorithm) used to calculate the state of this
+        resource
+        """
+        return (
+            self.fingerprint or hashes.DEFAULT_FINGERPRINT,
+            self.hash_algorithm or hashes.DEFAULT_ALGORITHM,
+        )
+
+    def has_weak_fingerprint(self):
+        """Check whether changes to this resource could go unnoticed"""
+        return self.hash_method[0] != hashes.DEFAULT_FINGERPRINT
 
-        TODO: need to figure out a way to avoid running this method
-        multiple times on the same resource during a single flo
-        run. this is more of a performance issue that can be revisited
-        later as it becomes an issue. can maybe cache somehow?
+    def same_hash_method(self, state):
+        """Check whether `state` was calculated with this resource's hash
+        method. Missing states are compatible with any method.
+        """
+        method = hashes.parse_state(state)
+        return method is None or method == self.hash_method
+
+    def calculate_current_state(self, algorithm=None, fingerprint=None):
+        """Calculate the current state of this resource with the specified
+        hash `algorithm` and `fingerprint` (by default, the
+        hash_algorithm and fingerprint of this resource). If the
+        resource does not exist, throw an error.
+
+        This method must be overwritten by any child classes.
         """
         raise NotImplementedError(
-            "Must implement current_state for child classes"
+            "Must implement calculate_current_state for child classes"
         )
 
+    def invalidate_state(self):
+        """Forget the cached current state of this resource, which is
+        necessary whenever the resource may have changed (e.g., after
+        the task that creates it has been run).
+        """
+        self.graph.current_states.pop(self.name, None)
+
     def state_in_sync(self):
         """Check the stored state of this resource compared with the current
         state of this resource. If they are the same, then this resource
         is in_sync.
+
+        If the stored state was calculated with a different hash
+        algorithm or fingerprint, the current state is recalculated in
+        the same way as the stored state for the comparison so that
+        switching does not make every resource look out of sync.
+        """
+        return self.state_matches(self.get_previous_state())
+
+    def state_matches(self, state):
+        """Check whether the current state of this resource is `state`,
+        calculated in the same way as `state`
         """
-        return self.get_previous_state() == self.get_current_state()
+        if self.same_hash_method(state):
+            return state == self.get_current_state()
+        fingerprint, algorithm = hashes.parse_state(state)
+        if not hashes.is_available(fingerprint, algorithm):
+            return False
+        return state == self.calculate_current_state(algorithm, fingerprint)
 
     def get_filename(self):
         """This gets a filename for a (possibly temporary) storage location
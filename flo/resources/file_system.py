@@ -1,39 +1,135 @@
 import os
+import time
+import errno
+import shutil
 import hashlib
 
 from .base import BaseResource
+from . import hashes
+
+
+def stat_signature(stat):
+    """An inexpensive signature of a file from its os.stat that changes
+    whenever the file changes: its size, modification time (in
+    nanoseconds) and inode.
+    """
+    return "%d:%d:%d" % (stat.st_size, stat.st_mtime * 10**9, stat.st_ino)
+
+
+def _ignore_missing(function, path, exc_info):
+    if getattr(exc_info[1], 'errno', None) != errno.ENOENT:
+        raise exc_info[1]
+
+
+def remove_path(path):
+    """Remove the file, link or directory tree at `path` like `rm -rf`
+    does, without following links. Returns whether there was anything
+    to remove.
+    """
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, onerror=_ignore_missing)
+        else:
+            os.remove(path)
+    except OSError, error:
+        if error.errno == errno.ENOENT:
+            return False
+        raise
+    return True
 
 
 class FileSystem(BaseResource):
     """Evaluate the state of resources on the file system.
     """
 
+    # files that were modified less than this many seconds ago do not
+    # get a stat signature because they could be modified again
+    # without changing their modification time (the same "racily
+    # clean" problem that git has with its index)
+    racy_interval = 1.0
+
     def __init__(self, *args, **kwargs):
         super(FileSystem, self).__init__(*args, **kwargs)
         self.resource_path = os.path.realpath(
             os.path.join(self.root_directory, self.name)
         )
 
-    def file_state(self, resource_path=None):
+    def file_state(self, resource_path=None, algorithm=None,
+                   fingerprint=None):
         with open(resource_path or self.resource_path) as stream:
-            state = self.get_stream_state(stream)
+            state = self.get_stream_state(stream, algorithm, fingerprint)
         return state
 
-    def directory_state(self):
-        state_hash = hashlib.sha1()
+    def directory_state(self, algorithm=None, fingerprint=None):
+        # hash all of the files in parallel (reading files and hashing
+        # both release the GIL) and combine them in a deterministic
+        # order
+        abs_filenames = [os.path.join(self.resource_path, filename)
+                         for filename in self.iter_filenames()]
+        state_hash = hashes.new(algorithm)
+        file_states = self.graph.hash_map(
+            lambda filename: self.file_state(filename, algorithm, fingerprint),
+            abs_filenames,
+        )
+        for file_state in file_states:
+            state_hash.update(file_state)
+        return hashes.format_state(state_hash.hexdigest(), algorithm,
+                                   fingerprint)
+
+    def iter_filenames(self):
+        """Iterate over the path of every file in this directory, relative to
+        this directory, in sorted order. os.walk alone does not return
+        files in the same order on every file system.
+        """
         for root, directories, filenames in os.walk(self.resource_path):
-            for filename in filenames:
+            directories.sort()
+            for filename in sorted(filenames):
                 abs_filename = os.path.join(root, filename)
-                state_hash.update(self.file_state(abs_filename))
-        return state_hash.hexdigest()
+                yield os.path.relpath(abs_filename, self.resource_path)
+
+    def iter_stats(self):
+        """Iterate over the relative path and os.stat of this file or every
+        file in this directory.
+        """
+        if os.path.isfile(self.resource_path):
+            yield '', os.stat(self.resource_path)
+        else:
+            for filename in self.iter_filenames():
+                abs_filename = os.path.join(self.resource_path, filename)
+                yield filename, os.stat(abs_filename)
+
+    def calculate_signature(self):
+        """The signature of a file is its size, modification time (in
+        nanoseconds) and inode. The signature of a directory is the
+        hash of the signatures of all of the files it contains.
+        """
+        if not os.path.exists(self.resource_path):
+            return None
+        now = time.time()
+        signatures = []
+        for relpath, stat in self.iter_stats():
+            if now - stat.st_mtime < self.racy_interval:
+                return None
+            signatures.append((relpath, stat_signature(stat)))
+        if os.path.isfile(self.resource_path):
+            return signatures[0][1]
+        signature_hash = hashlib.sha1()
+        for relpath, signature in signatures:
+            signature_hash.update(("%s:%s\n" % (relpath, signature)).encode(
+                'utf-8'
+            ))
+        return signature_hash.hexdigest()
 
-    def get_current_state(self):
+    def calculate_current_state(self, algorithm=None, fingerprint=None):
+        algorithm = algorithm or self.hash_algorithm
+        fingerprint = fingerprint or self.fingerprint
         if not os.path.exists(self.resource_path):
             return None
         elif os.path.isfile(self.resource_path):
-            return self.file_state()
+            return self.file_state(algorithm=algorithm,
+                                   fingerprint=fingerprint)
         elif os.path.isdir(self.resource_path):
-            return self.directory_state()
+            return self.directory_state(algorithm, fingerprint)
         else:
             raise NotImplementedError((
                 "file a feature request to support this type of "
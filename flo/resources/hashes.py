@@ -0,0 +1,166 @@
+"""The hash algorithms and fingerprints that can be used to calculate
+the state of a resource. States that are calculated with anything
+other than the DEFAULT_FINGERPRINT and DEFAULT_ALGORITHM are stored
+as '[fingerprint:][algorithm:]hexdigest' so that flo always knows how
+a stored state was produced.
+"""
+
+import hashlib
+
+from ..exceptions import CommandLineException
+
+DEFAULT_ALGORITHM = 'sha1'
+
+# a 'full' fingerprint hashes every byte of a resource whereas a
+# 'sampled' fingerprint only hashes the size of a file and
+# SAMPLED_BLOCKS blocks that are spread evenly throughout it
+DEFAULT_FINGERPRINT = 'full'
+FINGERPRINTS = ('full', 'sampled')
+SAMPLED_BLOCKS = 16
+
+ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+}
+
+# these algorithms are considerably faster than sha1 but are only
+# available when the corresponding packages are installed
+if hasattr(hashlib, 'blake2b'):
+    ALGORITHMS['blake2b'] = hashlib.blake2b
+else:
+    try:
+        import pyblake2
+    except ImportError:
+        pass
+    else:
+        ALGORITHMS['blake2b'] = pyblake2.blake2b
+try:
+    import xxhash
+except ImportError:
+    pass
+else:
+    ALGORITHMS['xxhash'] = xxhash.xxh64
+
+# packages that provide the optional algorithms, for error messages
+OPTIONAL_PACKAGES = {
+    'blake2b': 'pyblake2',
+    'xxhash': 'xxhash',
+}
+
+
+class UnknownHashAlgorithm(CommandLineException):
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+
+    def __str__(self):
+        if self.algorithm in OPTIONAL_PACKAGES:
+            return "Hash algorithm '%s' requires `pip install %s`" % (
+                self.algorithm, OPTIONAL_PACKAGES[self.algorithm],
+            )
+        return "Unknown hash algorithm '%s'; choose one of %s" % (
+            self.algorithm, ', '.join(sorted(ALGORITHMS)),
+        )
+
+
+class UnknownFingerprint(CommandLineException):
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+
+    def __str__(self):
+        return "Unknown fingerprint '%s'; choose one of %s" % (
+            self.fingerprint, ', '.join(FINGERPRINTS),
+        )
+
+
+def new(algorithm=None):
+    """Create a new hash object for the specified `algorithm`"""
+    algorithm = algorithm or DEFAULT_ALGORITHM
+    try:
+        return ALGORITHMS[algorithm]()
+    except KeyError:
+        raise UnknownHashAlgorithm(algorithm)
+
+
+def validate(algorithm):
+    """Make sure `algorithm` is available and return it"""
+    new(algorithm)
+    return algorithm
+
+
+def validate_fingerprint(fingerprint):
+    """Make sure `fingerprint` is supported and return it"""
+    if fingerprint not in FINGERPRINTS:
+        raise UnknownFingerprint(fingerprint)
+    return fingerprint
+
+
+def stream_state(stream, algorithm=None, block_size=2**20):
+    """Hash a stream with the specified `algorithm`, reading it in
+    `block_size` chunks.
+    """
+    state = new(algorithm)
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            break
+        state.update(data)
+    return format_state(state.hexdigest(), algorithm)
+
+
+def sampled_stream_state(stream, algorithm=None, block_size=2**20):
+    """Hash the size of a seekable stream along with its first block, its
+    last block and evenly spaced blocks in between. This only reads
+    SAMPLED_BLOCKS * `block_size` bytes no matter how big the stream
+    is, but it will not notice changes that leave the size of the
+    stream unchanged and fall between the sampled blocks.
+    """
+    stream.seek(0, 2)
+    size = stream.tell()
+    state = new(algorithm)
+    state.update("%d\n" % size)
+    if size <= SAMPLED_BLOCKS * block_size:
+        offsets = [0]
+        block_size = size
+    else:
+        stride = (size - block_size) // (SAMPLED_BLOCKS - 1)
+        offsets = [i * stride for i in range(SAMPLED_BLOCKS - 1)]
+        offsets.append(size - block_size)
+    for offset in offsets:
+        stream.seek(offset)
+        state.update(stream.read(block_size))
+    return format_state(state.hexdigest(), algorithm, 'sampled')
+
+
+def format_state(hexdigest, algorithm=None, fingerprint=None):
+    """Prefix `hexdigest` with the `algorithm` and `fingerprint` that were
+    used to calculate it to make a state string
+    """
+    prefix = ''
+    if fingerprint not in (None, DEFAULT_FINGERPRINT):
+        prefix += fingerprint + ':'
+    if algorithm not in (None, DEFAULT_ALGORITHM):
+        prefix += algorithm + ':'
+    return prefix + hexdigest
+
+
+def parse_state(state):
+    """Get the (fingerprint, algorithm) that were used to calculate
+    `state`, or None if there is no state.
+    """
+    if not state:
+        return None
+    prefix = state.split(':')[:-1]
+    fingerprint, algorithm = DEFAULT_FINGERPRINT, DEFAULT_ALGORITHM
+    if prefix and prefix[0] in FINGERPRINTS:
+        fingerprint = prefix.pop(0)
+    if prefix:
+        algorithm = prefix.pop(0)
+    return fingerprint, algorithm
+
+
+def is_available(fingerprint, algorithm):
+    """Check whether states can be calculated with this `fingerprint` and
+    `algorithm`
+    """
+    return fingerprint in FINGERPRINTS and algorithm in ALGORITHMS
@@ -0,0 +1,245 @@
+"""A light webserver that displays the status of a workflow. Requests
+are handled concurrently and the status is only recalculated when a
+resource or the stored states change, so that any number of browsers
+can poll the status without rehashing anything. The progress of `flo
+run` is pushed to browsers as server-sent events.
+"""
+import os
+import time
+import socket
+import hashlib
+import threading
+import Queue
+import BaseHTTPServer
+import SocketServer
+
+from . import templates
+
+
+class StatusSnapshot(object):
+    """The status of a workflow as json and as a rendered status page,
+    which is recalculated whenever the status signature of the
+    workflow changes. The status signature is checked at most once
+    every `check_interval` seconds.
+    """
+
+    check_interval = 0.5
+
+    def __init__(self, task_graph):
+        self.task_graph = task_graph
+        self.lock = threading.Lock()
+        self.signature = None
+        self.checked = None
+        self.json = self.html = self.etag = None
+
+    def get(self):
+        """Get an up to date (json, html, etag) snapshot"""
+        with self.lock:
+            now = time.time()
+            if (self.checked is None or
+                    now - self.checked > self.check_interval):
+                self.checked = now
+                signature = self.task_graph.status_signature()
+                if signature is None or signature != self.signature:
+                    self.update(signature)
+            return self.json, self.html, self.etag
+
+    def update(self, signature):
+        # this is only called while holding self.lock, so the state of
+        # the workflow is never reloaded by two threads at once
+        self.task_graph.reload_state()
+        self.signature = signature
+        self.json = self.task_graph.status_json()
+        self.html = templates.render_from_file(
+            "status.html", task_graph=self.task_graph, status_json=self.json,
+        ).encode('utf-8')
+        self.etag = '"%s"' % hashlib.sha1(self.json).hexdigest()
+
+
+class EventStream(threading.Thread):
+    """Follow the events that `flo run` writes to `path` and pass them on
+    to every subscriber. This thread is the only thing that reads the
+    file, no matter how many browsers are watching, and it remembers
+    the events of the latest run so that new subscribers can catch up.
+    """
+
+    poll_interval = 0.25
+
+    # subscribers receive None every `keepalive_interval` seconds so
+    # that connections of clients that went away are noticed
+    keepalive_interval = 15.0
+
+    def __init__(self, path):
+        super(EventStream, self).__init__()
+        self.daemon = True
+        self.path = path
+        self.lock = threading.Lock()
+        self.events = []
+        self.subscribers = set()
+        self._inode = None
+        self._offset = 0
+        self._partial = ''
+
+    def subscribe(self, last_event_id=None):
+        """Subscribe to new events. Returns the (event_id, data) of the
+        events after `last_event_id` in the latest run and a queue that
+        receives every new event.
+        """
+        queue = Queue.Queue()
+        with self.lock:
+            self.subscribers.add(queue)
+            ids = [event_id for event_id, data in self.events]
+            start = 0
+            if last_event_id in ids:
+                start = ids.index(last_event_id) + 1
+            return self.events[start:], queue
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            self.subscribers.discard(queue)
+
+    def run(self):
+        last_keepalive = time.time()
+        while True:
+            try:
+                self.poll()
+            except (IOError, OSError):
+                pass
+            if time.time() - last_keepalive > self.keepalive_interval:
+                last_keepalive = time.time()
+                self.publish(None)
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        """Read any events that were written since the last poll"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if stat.st_ino == self._inode and stat.st_size == self._offset:
+            return
+        with open(self.path) as stream:
+            # every run replaces the file, which starts a new list of
+            # events
+            stat = os.fstat(stream.fileno())
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._inode, self._offset, self._partial = stat.st_ino, 0, ''
+                with self.lock:
+                    self.events = []
+            stream.seek(self._offset)
+            data = stream.read()
+        offset = self._offset - len(self._partial)
+        self._offset += len(data)
+
+        # only pass on complete lines. the id of each event is its
+        # position in the file, which lets reconnecting browsers
+        # continue where they left off
+        lines = (self._partial + data).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            offset += len(line) + 1
+            if line:
+                self.publish(("%d-%d" % (self._inode, offset), line))
+
+    def publish(self, event):
+        with self.lock:
+            if event is not None:
+                self.events.append(event)
+            for queue in self.subscribers:
+                queue.put(event)
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    # keep connections open so that polling the status is cheap
+    protocol_version = "HTTP/1.1"
+
+    snapshot = None
+    event_stream = None
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/events':
+            return self.send_events()
+        json, html, etag = self.snapshot.get()
+        if path == '/':
+            self.send_content(html, "text/html; charset=utf-8", etag)
+        elif path == '/status.json':
+            self.send_content(json, "application/json", etag)
+        else:
+            self.send_error(404)
+
+    def send_content(self, content, content_type, etag):
+        # the browser asks whether anything changed with the ETag of
+        # the last response and nothing is sent if nothing changed
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_events(self):
+        """Stream the events of `flo run` to the client until it goes away"""
+        backlog, queue = self.event_stream.subscribe(
+            self.headers.get("Last-Event-ID"),
+        )
+        self.close_connection = 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for event in backlog:
+                self.send_event(event)
+            while True:
+                self.send_event(queue.get())
+        except socket.error:
+            pass
+        finally:
+            self.event_stream.unsubscribe(queue)
+
+    def send_event(self, event):
+        if event is None:
+            self.wfile.write(": keepalive\n\n")
+        else:
+            self.wfile.write("id: %s\ndata: %s\n\n" % event)
+        self.wfile.flush()
+
+    def log_request(self, code='-', size='-'):
+        # polling the status produces a steady stream of 304s that
+        # are not worth logging
+        if code != 304:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_request(
+                self, code, size,
+            )
+
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Handle every request in its own thread so that a slow client does
+    not hold up everyone else.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(task_graph, port):
+    """Serve the status of `task_graph` on `port` until interrupted"""
+    Handler.snapshot = StatusSnapshot(task_graph)
+    Handler.event_stream = EventStream(task_graph.abs_events_path)
+    Handler.event_stream.start()
+    httpd = Server(("", port), Handler)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -1,47 +1,116 @@
 """Module for executing commands on the command line
 """
+import os
+import errno
+import shlex
 import subprocess
-import sys
-import threading
+import time
+import select
 
 from . import exceptions
 from . import logger as flo_logger
 
+# commands that contain any of these characters or that start with any
+# of these words are run in a shell
+SHELL_METACHARACTERS = frozenset('|&;<>()$`\\"\'*?[]{}#~=!\n')
+SHELL_BUILTINS = frozenset([
+    '.', ':', 'alias', 'bg', 'break', 'case', 'cd', 'command', 'continue',
+    'eval', 'exec', 'exit', 'export', 'fg', 'for', 'function', 'if',
+    'jobs', 'read', 'readonly', 'return', 'set', 'shift', 'source', 'trap',
+    'ulimit', 'umask', 'unalias', 'unset', 'until', 'wait', 'while',
+])
 
-def log_output(stream, block_size=1):
+
+def log_output(stream, block_size=2**16, flush_interval=0.1):
     """This function logs the output from the subprocess'ed command by
-    reading the output stream in small blocks of size `block_size`
-    bytes to properly handle backspacing outputs (issue #53)
+    reading whatever output is available, up to `block_size` bytes at
+    a time. Output is passed on to the logger as soon as it contains a
+    newline or `flush_interval` seconds after the last time output was
+    logged so that progress bars that use backspaces and carriage
+    returns are still displayed properly (issue #53) without logging
+    every single byte separately.
     """
     logger = flo_logger.get()
+    fd = stream.fileno()
+    pending, last_flush = [], time.time()
     while True:
-        data = stream.read(block_size)
-        if not data:
-            break
-        logger.write(data)
+        timeout = None
+        if pending:
+            timeout = max(0.0, last_flush + flush_interval - time.time())
+
+        # select guarantees that os.read returns immediately with
+        # whatever is available rather than waiting for `block_size`
+        # bytes
+        readable, writable, exceptional = select.select(
+            [fd], [], [], timeout,
+        )
+        if readable:
+            data = os.read(fd, block_size)
+            if not data:
+                break
+            pending.append(data)
+            if ('\n' not in data and
+                    time.time() - last_flush < flush_interval):
+                continue
+        logger.write(''.join(pending))
+        pending, last_flush = [], time.time()
+    if pending:
+        logger.write(''.join(pending))
     stream.close()
 
 
-def run(directory, command):
-    """Run the specified shell command using Fabric-like behavior."""
+def needs_shell(command):
+    """Check whether `command` uses any features of the shell. Commands
+    that don't can be executed directly, which avoids starting a
+    shell for every command.
+    """
+    if SHELL_METACHARACTERS.intersection(command):
+        return True
+    words = command.split()
+    return not words or words[0] in SHELL_BUILTINS
+
+
+def run(directory, command, use_shell=None):
+    """Run the specified shell command from `directory` using Fabric-like
+    behavior. By default, `command` is only run in a shell if it uses
+    features of the shell. If `use_shell` is True, it is always run
+    in a shell and if it is False, it is never run in a shell; it is
+    split into arguments like a shell would instead.
+    """
+    if use_shell is None:
+        use_shell = needs_shell(command)
+    if use_shell:
+        args = command
+    else:
+        # shlex does not support unicode in python 2
+        if isinstance(command, unicode):
+            command = command.encode('utf-8')
+        args = shlex.split(command)
+        if not args:
+            return
 
     # combine stderr and stdout output when running command so we can
     # stream output to the logger for output to terminal and file
     # simultaneously
-    wrapped_command = "cd %s && %s" % (directory, command)
-    pipe = subprocess.Popen(
-        wrapped_command, shell=True,
-        stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-    )
-
-    # this uses threading to capture the output in real time in a
-    # non-blocking way and use the log_output function to report the
-    # output using the logging module. This framework takes
-    # inspiration from http://stackoverflow.com/a/4985080/564709
-    thread = threading.Thread(target=log_output, args=(pipe.stdout,))
-    thread.daemon = True
-    thread.start()
-    thread.join()
+    try:
+        pipe = subprocess.Popen(
+            args, shell=use_shell, cwd=directory,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        )
+    except OSError, error:
+        # mimic the shell when a command can not be executed
+        if error.errno == errno.ENOENT:
+            flo_logger.get().write("%s: command not found\n" % args[0])
+            raise exceptions.ShellError(127)
+        flo_logger.get().write("%s: %s\n" % (args[0], error.strerror))
+        raise exceptions.ShellError(126)
+
+    # capture the output in real time from the thread that runs the
+    # command, which is waiting for the command to finish anyway. this
+    # must not happen on another thread, which would bypass the
+    # buffer that keeps the output of parallel tasks together (see
+    # Logger.buffered)
+    log_output(pipe.stdout)
     pipe.wait()
 
     # if pipe is busted, raise an error
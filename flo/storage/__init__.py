@@ -0,0 +1,27 @@
+from . import base
+from .csv_storage import CsvStorage
+from .sqlite_storage import SqliteStorage
+from ..exceptions import CommandLineException
+
+# the available ways of storing the state of a workflow, keyed by the
+# name that is used for the `state_backend` in flo.yaml
+BACKENDS = {
+    'csv': CsvStorage,
+    'sqlite': SqliteStorage,
+}
+
+
+def get_backend(task_graph, name=None):
+    """This factory function instantiates the storage backend called
+    `name` for the specified task_graph.
+    """
+    name = name or 'csv'
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise CommandLineException(
+            "Unknown state_backend '%s'; choose one of %s" % (
+                name, ', '.join(sorted(BACKENDS)),
+            )
+        )
+    return backend_class(task_graph)
@@ -0,0 +1,67 @@
+"""Base storage backend here
+"""
+
+import os
+
+
+class BaseStorage(object):
+    """A storage backend keeps track of the state of every resource and
+    the duration of every task between flo runs, typically somewhere
+    in the .flo/ directory.
+
+    Resource states are dictionaries keyed by the resource name whose
+    values are the [state, signature] of each resource. Durations are
+    dictionaries keyed by task id whose values are the number of
+    seconds that each task took the last time it ran.
+    """
+
+    # whether this backend stores the state of each task as soon as it
+    # finishes (see `save_task`)
+    incremental = False
+
+    def __init__(self, task_graph):
+        self.task_graph = task_graph
+
+    @property
+    def root_directory(self):
+        """Easy access to the graph's root_directory"""
+        return self.task_graph.root_directory
+
+    @property
+    def filenames(self):
+        """The files (relative to the root directory) where this backend
+        stores everything, which are included in archives.
+        """
+        raise NotImplementedError(
+            "Must implement filenames for child classes"
+        )
+
+    def abs_path(self, path):
+        return os.path.join(self.root_directory, path)
+
+    def load(self):
+        """Load the stored resource states and task durations. Returns a
+        (states, durations) tuple.
+        """
+        raise NotImplementedError("Must implement load for child classes")
+
+    def save(self, states, durations):
+        """Store the states of all resources and durations of all tasks,
+        replacing whatever was stored before.
+        """
+        raise NotImplementedError("Must implement save for child classes")
+
+    def save_task(self, states, task_id, duration):
+        """Store the states of the resources of a single task as soon as that
+        task has finished running. This is only called for backends
+        that are `incremental`.
+        """
+        raise NotImplementedError(
+            "Must implement save_task for incremental backends"
+        )
+
+    def clear_states(self):
+        """Forget the stored states of all resources"""
+        raise NotImplementedError(
+            "Must implement clear_states for child classes"
+        )
@@ -0,0 +1,76 @@
+import os
+import csv
+
+from .base import BaseStorage
+
+
+class CsvStorage(BaseStorage):
+    """Store resource states in .flo/state.csv and task durations in
+    .flo/duration.csv. Both files are rewritten in their entirety at
+    the end of every run.
+    """
+
+    state_filename = "state.csv"
+    duration_filename = "duration.csv"
+
+    @property
+    def state_path(self):
+        return os.path.join(self.task_graph.internals_path,
+                            self.state_filename)
+
+    @property
+    def duration_path(self):
+        return os.path.join(self.task_graph.internals_path,
+                            self.duration_filename)
+
+    @property
+    def filenames(self):
+        return [self.state_path, self.duration_path]
+
+    def read_from_storage(self, storage_location, all_columns=False):
+        dictionary = {}
+        if os.path.exists(storage_location):
+            with open(storage_location) as stream:
+                reader = csv.reader(stream)
+                for row in reader:
+                    if all_columns:
+                        dictionary[row[0]] = row[1:]
+                    else:
+                        dictionary[row[0]] = row[1]
+        return dictionary
+
+    def write_to_storage(self, dictionary, storage_location):
+        # write everything to a temporary file first and then move it
+        # into place so that a crash part way through writing never
+        # wipes out the previously stored data
+        temp_location = "%s.%d.tmp" % (storage_location, os.getpid())
+        with open(temp_location, 'w') as stream:
+            writer = csv.writer(stream)
+            for key, value in dictionary.iteritems():
+                if isinstance(value, (list, tuple)):
+                    writer.writerow([key] + list(value))
+                else:
+                    writer.writerow([key, value])
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.rename(temp_location, storage_location)
+
+    def load(self):
+        states = self.read_from_storage(
+            self.abs_path(self.state_path), all_columns=True,
+        )
+        durations = self.read_from_storage(self.abs_path(self.duration_path))
+
+        # typecast the durations
+        for task_id, duration in durations.iteritems():
+            durations[task_id] = float(duration)
+        return states, durations
+
+    def save(self, states, durations):
+        self.write_to_storage(states, self.abs_path(self.state_path))
+        self.write_to_storage(durations, self.abs_path(self.duration_path))
+
+    def clear_states(self):
+        abs_state_path = self.abs_path(self.state_path)
+        if os.path.exists(abs_state_path):
+            os.remove(abs_state_path)
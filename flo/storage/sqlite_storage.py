@@ -0,0 +1,136 @@
+import os
+import time
+import sqlite3
+import threading
+
+from .base import BaseStorage
+from .csv_storage import CsvStorage
+
+
+class SqliteStorage(BaseStorage):
+    """Store resource states and the full history of task durations in a
+    SQLite database at .flo/state.db. Unlike the CsvStorage, the
+    states of each task are stored in their own transaction as soon
+    as the task finishes. The first time this backend is used, any
+    states and durations in the CsvStorage files are imported.
+    """
+
+    database_filename = "state.db"
+    incremental = True
+
+    schema = [
+        "CREATE TABLE IF NOT EXISTS states ("
+        "    name TEXT PRIMARY KEY, state TEXT, signature TEXT"
+        ")",
+        "CREATE TABLE IF NOT EXISTS durations ("
+        "    task_id TEXT, duration REAL, finished_at REAL"
+        ")",
+        "CREATE INDEX IF NOT EXISTS durations_task_id "
+        "    ON durations (task_id)",
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super(SqliteStorage, self).__init__(*args, **kwargs)
+        self._connection = None
+
+        # the connection is shared by every thread (like the threads
+        # of `flo status --serve`), one thread at a time
+        self._lock = threading.RLock()
+
+        # the most recently stored duration of each task, which is
+        # used to avoid storing the same duration more than once
+        self._latest_durations = {}
+
+    @property
+    def database_path(self):
+        return os.path.join(self.task_graph.internals_path,
+                            self.database_filename)
+
+    @property
+    def filenames(self):
+        return [self.database_path]
+
+    @property
+    def connection(self):
+        with self._lock:
+            if self._connection is None:
+                abs_database_path = self.abs_path(self.database_path)
+                is_new = not os.path.exists(abs_database_path)
+                self._connection = sqlite3.connect(
+                    abs_database_path, check_same_thread=False,
+                )
+                with self._connection:
+                    for statement in self.schema:
+                        self._connection.execute(statement)
+                if is_new:
+                    self.migrate_from_csv()
+            return self._connection
+
+    def migrate_from_csv(self):
+        """Import the states and durations from the CsvStorage, if there
+        are any, so switching backends does not put everything out of
+        sync.
+        """
+        states, durations = CsvStorage(self.task_graph).load()
+        self.save(states, durations)
+
+    def load(self):
+        with self._lock:
+            states = {}
+            for name, state, signature in self.connection.execute(
+                "SELECT name, state, signature FROM states"
+            ):
+                states[name] = [state or '', signature or '']
+            durations = {}
+            for task_id, duration in self.connection.execute(
+                "SELECT task_id, duration FROM durations ORDER BY rowid"
+            ):
+                durations[task_id] = duration
+            self._latest_durations.update(durations)
+        return states, dict(durations)
+
+    def _store(self, states, durations, replace=False):
+        """Store the states and any new durations in a single transaction.
+        If `replace` is set, the states of resources that are not in
+        `states` are deleted in the same transaction.
+        """
+        with self._lock, self.connection:
+            if replace:
+                stored_names = set(name for name, in self.connection.execute(
+                    "SELECT name FROM states"
+                ))
+                self.connection.executemany(
+                    "DELETE FROM states WHERE name = ?",
+                    [(name,) for name in stored_names.difference(states)],
+                )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO states VALUES (?, ?, ?)",
+                [self._row(name, record)
+                 for name, record in states.iteritems()],
+            )
+            now = time.time()
+            for task_id, duration in durations.iteritems():
+                if self._latest_durations.get(task_id) != duration:
+                    self.connection.execute(
+                        "INSERT INTO durations VALUES (?, ?, ?)",
+                        (task_id, duration, now),
+                    )
+                    self._latest_durations[task_id] = duration
+
+    def _row(self, name, record):
+        state = record[0] if record else None
+        signature = record[1] if len(record) > 1 else None
+        return name, state, signature
+
+    def save(self, states, durations):
+        self._store(states, durations, replace=True)
+
+    def save_task(self, states, task_id, duration):
+        durations = {}
+        if duration is not None:
+            durations[task_id] = duration
+        self._store(states, durations)
+
+    def clear_states(self):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM states")
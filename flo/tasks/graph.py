@@ -1,21 +1,25 @@
 import sys
 import os
 import time
-import csv
+import heapq
 import collections
 import datetime
 import glob
 from distutils.util import strtobool
 import json
-
-import networkx as nx
+from multiprocessing.pool import ThreadPool
 
 from ..exceptions import NonUniqueTask, ShellError, CommandLineException
 from .. import colors
-from .. import shell
+from .. import workers
+from .. import events
+from .. import archives
+from ..resources.file_system import FileSystem, remove_path
 from .. import resources
+from .. import storage
 from .. import logger
 from .task import Task
+from .scheduler import Scheduler, SimulatedScheduler
 
 
 class TaskGraph(object):
@@ -23,38 +27,87 @@ class TaskGraph(object):
 
     # relative location of various storage locations
     internals_path = ".flo"
-    state_path = os.path.join(internals_path, "state.csv")
-    duration_path = os.path.join(internals_path, "duration.csv")
     log_path = os.path.join(internals_path, "flo.log")
+    events_path = os.path.join(internals_path, "events.jsonl")
     archive_dir = os.path.join(internals_path, "archive")
+    objects_dir = os.path.join(internals_path, "objects")
+
+    # keys in flo.yaml that configure flo itself rather than what any
+    # task does. Changing these does not change the state of any task.
+    settings_keys = (
+        'state_backend', 'hash_threads', 'hash', 'fingerprint',
+        'notify_lines', 'notify_bytes',
+    )
 
-    def __init__(self, config_path, task_kwargs_list):
+    def __init__(self, config_path, task_kwargs_list, global_config=None):
         self.task_list = []
         self.task_dict = {}
+        self.global_config = global_config or {}
+
+        # the position of every task in task_list and the order of
+        # iter_tasks are cached until the graph changes
+        self._task_index = None
+        self._task_order_cache = {}
 
         # store paths once for all tasks and make sure the base
         # directory exists
         self.config_path = config_path
         self.root_directory = os.path.dirname(config_path)
-        directory = os.path.dirname(self.abs_state_path)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+        if not os.path.exists(self.abs_internals_path):
+            os.makedirs(self.abs_internals_path)
         if not os.path.exists(self.abs_archive_dir):
             os.makedirs(self.abs_archive_dir)
 
+        # the storage backend is responsible for storing resource
+        # states and task durations between runs
+        self.storage = storage.get_backend(
+            self, self.global_config.get('state_backend'),
+        )
+
         # Store the resources in a dictionary, keyed by name where the
         # values are resource instances
         self.resource_dict = {}
 
+        # cache the current state of each resource, keyed by name, so
+        # that every resource is only hashed once per run. Unless
+        # verify_states is set, resources whose stat signature has not
+        # changed since the last run are not hashed at all
+        self.current_states = {}
+        self.verify_states = False
+
         # store the time that this task takes
         self.task_durations = {}
 
+        # the files in directory resources are hashed by a pool of
+        # `hash_threads` threads, which is created when it is needed
+        self.hash_threads = int(self.global_config.get('hash_threads', 4))
+        self._hash_pool = None
+
+        # the commands of python tasks are run by a pool of python
+        # worker processes that is started just before running tasks
+        self._worker_pool = None
+
+        # the stored state of every resource from .flo/state.csv,
+        # keyed by name, which is loaded once and written once
+        self.stored_states = {}
+
+        # the tasks whose states were saved as soon as they finished
+        # during the current run
+        self.saved_tasks = set()
+
         # instantiate the logger instance for this workflow
         self.logger = logger.configure(self)
 
-        # the success status is used for managing notification emails
-        # in an intelligent way
+        # the success status and the scheduler of the last run are
+        # used for managing notification emails in an intelligent
+        # way. notification emails include at most `notify_lines`
+        # lines and `notify_bytes` bytes of output
         self.successful = False
+        self.scheduler = None
+        self.notify_lines = int(self.global_config.get('notify_lines', 100))
+        self.notify_bytes = int(
+            self.global_config.get('notify_bytes', 2**16)
+        )
 
         # add tasks and load all dependencies between tasks
         for task_kwargs in task_kwargs_list:
@@ -63,69 +116,203 @@ class TaskGraph(object):
         self._load_state()
 
         # confirm that this is a DAG without any dependency loops
-        nx_graph = self.get_networkx_graph(task_id_only=True)
-        if not nx.is_directed_acyclic_graph(nx_graph):
+        cycles = self.find_cycles()
+        if cycles:
             msg = "This task graph has the following dependency cycles:\n\n"
-            cycles = nx.simple_cycles(nx_graph)
             for cycle in cycles:
-                msg += '  %s\n' % cycle[0]
-                for task_id in cycle[1:]:
-                    msg += '    -> %s\n' % task_id
+                msg += '  %s\n' % cycle[0].id
+                for task in cycle[1:] + cycle[:1]:
+                    msg += '    -> %s\n' % task.id
             raise CommandLineException(msg)
 
+    def find_cycles(self):
+        """Find dependency cycles with a depth-first search in the order of
+        the YAML file. Every cycle is a list of tasks where each task
+        is upstream of the next one and the last task is upstream of
+        the first one. This finds at least one cycle if there are any,
+        but not necessarily every cycle.
+        """
+        cycles = []
+        finished, path_index = set(), {}
+        for root in self.task_list:
+            if root in finished:
+                continue
+            path = [root]
+            path_index[root] = 0
+            stack = [self._sorted_tasks(root.downstream_tasks)]
+            while stack:
+                if not stack[-1]:
+                    task = path.pop()
+                    del path_index[task]
+                    finished.add(task)
+                    stack.pop()
+                    continue
+                task = stack[-1].pop()
+                if task in path_index:
+                    cycles.append(path[path_index[task]:])
+                elif task not in finished:
+                    path_index[task] = len(path)
+                    path.append(task)
+                    stack.append(self._sorted_tasks(task.downstream_tasks))
+        return cycles
+
+    def _sorted_tasks(self, tasks):
+        """Sort `tasks` in reverse YAML order so that popping them returns
+        them in YAML order
+        """
+        index = self.task_index
+        return sorted(tasks, key=index.get, reverse=True)
+
+    def _reachable(self, task, neighbors):
+        """Find every task that can be reached from `task` by repeatedly
+        following `neighbors` (either 'upstream_tasks' or
+        'downstream_tasks'), not including `task` itself
+        """
+        reachable = set()
+        horizon = [task]
+        while horizon:
+            for neighbor in getattr(horizon.pop(), neighbors):
+                if neighbor not in reachable:
+                    reachable.add(neighbor)
+                    horizon.append(neighbor)
+        reachable.discard(task)
+        return reachable
+
+    def ancestors(self, task):
+        """All of the tasks that `task` depends on, directly or indirectly"""
+        return self._reachable(task, 'upstream_tasks')
+
+    def descendants(self, task):
+        """All of the tasks that depend on `task`, directly or indirectly"""
+        return self._reachable(task, 'downstream_tasks')
+
+    def between(self, start, end):
+        """All of the tasks on any path from `start` to `end`, including
+        `start` and `end`
+        """
+        descendants = self.descendants(start)
+        if end not in descendants:
+            return set()
+        task_subset = descendants.intersection(self.ancestors(end))
+        task_subset.update([start, end])
+        return task_subset
+
     def iter_tasks(self, tasks=None):
-        """Iterate over graph starting from `tasks` with a customized
-        breadth-first search to ensure that task dependencies are
-        preserved and that tasks are returned in a deterministic
-        order. One important difference between this method and
-        standard breadth first search is that we want to track the
-        *maximum* distance from any source to every other task to make
-        sure the ordering is correct.
+        """Iterate over `tasks` and everything downstream of them in an order
+        that preserves task dependencies and is deterministic. Tasks
+        are ordered by their depth (the *maximum* distance from any of
+        the starting tasks) and then by their order in the YAML file.
 
         If no starting `tasks` are specified, this algorithm starts
         with the set of tasks that do not depend on anything.
         """
         source_tasks = tasks or self.get_source_tasks()
-        distances = {}
+        key = frozenset(source_tasks)
+        try:
+            order = self._task_order_cache[key]
+        except KeyError:
+            order = self._task_order_cache[key] = self._order_tasks(key)
+        return iter(order)
+
+    def _order_tasks(self, source_tasks):
+        """Topologically sort `source_tasks` and everything downstream of
+        them with Kahn's algorithm, always choosing the ready task
+        with the smallest (depth, index in the YAML file). Because
+        every task is deeper than all of its upstream tasks, this is
+        the same as sorting by (depth, index) but takes O(E log N)
+        instead of quadratic time.
+        """
+        index = self.task_index
+
+        # only count the upstream tasks that are reachable from the
+        # source_tasks. source tasks that are downstream of other
+        # source tasks need to wait for them, too.
+        n_waiting = dict((task, 0) for task in source_tasks)
         horizon = list(source_tasks)
-        done, horizon_set = set(), set(source_tasks)
-        source_tasks = set(source_tasks)
         while horizon:
-            # before popping task off the horizon list, make sure all
-            # of its dependencies have been completed
-            found = False
-            for task in horizon:
-                if (
-                    task in source_tasks or
-                    not task.upstream_tasks.difference(done)
-                ):
-                    found = True
-                    break
-            if not found:
-                raise Exception("NOT FOUND %s" % ([t.id for t in horizon], ))
-            if task in source_tasks:
-                distance = 0
-            else:
-                distance = max(map(distances.get, task.upstream_tasks)) + 1
-            distances[task] = distance
-            horizon.remove(task)
-            horizon_set.discard(task)
-            done.add(task)
-            for downstream_task in task.downstream_tasks.difference(done):
-                if downstream_task not in horizon_set:
+            task = horizon.pop()
+            for downstream_task in task.downstream_tasks:
+                if downstream_task not in n_waiting:
+                    n_waiting[downstream_task] = 0
                     horizon.append(downstream_task)
-                    horizon_set.add(downstream_task)
-
-        # now create a decorated list of based on the distance and
-        # ordering in the YAML file
-        decorated_list = []
-        for task, distance in distances.iteritems():
-            decorated_list.append((
-                distance, self.task_list.index(task), task,
-            ))
-        decorated_list.sort()
-        for distance, index, task in decorated_list:
-            yield task
+                n_waiting[downstream_task] += 1
+
+        depths = {}
+        ready = [(0, index[task], task)
+                 for task, n in n_waiting.iteritems() if n == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            depth, i, task = heapq.heappop(ready)
+            order.append(task)
+            for downstream_task in task.downstream_tasks:
+                depths[downstream_task] = max(
+                    depths.get(downstream_task, 0), depth + 1,
+                )
+                n_waiting[downstream_task] -= 1
+                if n_waiting[downstream_task] == 0:
+                    heapq.heappush(ready, (
+                        depths[downstream_task],
+                        index[downstream_task],
+                        downstream_task,
+                    ))
+        return order
+
+    @property
+    def task_index(self):
+        """The position of every task in the YAML file"""
+        if self._task_index is None:
+            self._task_index = dict(
+                (task, i) for i, task in enumerate(self.task_list)
+            )
+        return self._task_index
+
+    def invalidate_task_order(self):
+        """Forget the cached order of tasks, which is necessary whenever
+        tasks or dependencies are added to or removed from the graph
+        """
+        self._task_index = None
+        self._task_order_cache.clear()
+
+    def hash_map(self, func, filenames):
+        """Apply `func` to every filename in parallel, returning the results
+        in the same order as `filenames`.
+        """
+        if self.hash_threads <= 1 or len(filenames) <= 1:
+            return map(func, filenames)
+        if self._hash_pool is None:
+            self._hash_pool = ThreadPool(self.hash_threads)
+        return self._hash_pool.map(func, filenames)
+
+    def start_worker_pool(self, tasks, jobs=1):
+        """Start enough python workers to run the python tasks in `tasks`
+        up to `jobs` at a time. The workers are forked now, before
+        any tasks are running, and import the modules of these tasks
+        while the workflow gets going.
+        """
+        python_tasks = [task for task in tasks if task.python_modules]
+        if python_tasks:
+            modules = []
+            for task in python_tasks:
+                for module in task.python_modules:
+                    if module not in modules:
+                        modules.append(module)
+            self._worker_pool = workers.WorkerPool(
+                self.root_directory,
+                n_workers=min(jobs, len(python_tasks)),
+                preload_modules=modules,
+            )
+
+    def get_worker_pool(self):
+        """Get the pool of python workers, starting one if necessary"""
+        if self._worker_pool is None:
+            self._worker_pool = workers.WorkerPool(self.root_directory)
+        return self._worker_pool
+
+    def stop_worker_pool(self):
+        if self._worker_pool is not None:
+            self._worker_pool.close()
+            self._worker_pool = None
 
     def get_source_tasks(self):
         """Get the set of tasks that do not depend on anything else.
@@ -158,6 +345,7 @@ class TaskGraph(object):
         TaskGraph.task_dict, keyed by task.creates.
         """
         self.task_list.append(task)
+        self.invalidate_task_order()
         if task.creates in self.task_dict:
             raise NonUniqueTask(
                 "task `creates` '%s' is not unique" % task.creates
@@ -171,6 +359,7 @@ class TaskGraph(object):
         # remove this element from the TaskGraph
         task = self.task_dict.pop(task_id)
         self.task_list.remove(task)
+        self.invalidate_task_order()
         if task_id in self.task_durations:
             self.task_durations.pop(task_id)
 
@@ -187,35 +376,72 @@ class TaskGraph(object):
         del task
 
     def subgraph_needed_for(self, start_at, end_at):
-        """Find the subgraph of all dependencies to run these tasks. Returns a
-        new graph.
+        """Restrict this graph to the subgraph of all dependencies to run
+        these tasks. The tasks are removed from this graph in place,
+        rather than parsing the configuration into a new graph, and
+        this graph is returned for convenience.
         """
         assert start_at or end_at, "one of {start_at,end_at} must be a task id"
         start, end = map(self.task_dict.get, [start_at, end_at])
         if None in [start, end]:
-            graph = self.get_networkx_graph()
             if start:
-                task_subset = nx.descendants(graph, start)
+                task_subset = self.descendants(start)
                 task_subset.add(start)
             elif end:
-                task_subset = nx.ancestors(graph, end)
+                task_subset = self.ancestors(end)
                 task_subset.add(end)
         elif start == end:
             task_subset = set([start])
         else:
-            graph = self.get_networkx_graph()
-            task_subset = set()
-            for path in nx.all_simple_paths(graph, start, end):
-                task_subset.update(path)
-
-        # make sure the tasks are added to the subgraph in the same
-        # order as the original configuration file
-        tasks_kwargs_list = [task.yaml_data for task in self.task_list
-                             if task in task_subset]
-        subgraph = TaskGraph(self.config_path, tasks_kwargs_list)
-        return subgraph
+            task_subset = self.between(start, end)
+        self.restrict_to(task_subset)
+        return self
+
+    def restrict_to(self, task_subset):
+        """Remove every task that is not in `task_subset` from this graph
+        along with the resources that are not used by any of the
+        remaining tasks. Resources that are created by a removed task
+        but that remaining tasks depend on are kept, just like they
+        would be if the removed tasks were not in the configuration
+        file at all. The stored durations of the removed tasks are
+        kept so that they are not lost when the state is saved.
+        """
+        removed_tasks = [t for t in self.task_list if t not in task_subset]
+        if not removed_tasks:
+            return
+        self.task_list = [t for t in self.task_list if t in task_subset]
+        for task in removed_tasks:
+            self.task_dict.pop(task.id)
+            self.resource_dict.pop(task.config_resource_id)
+            for resource in task.depends_resources:
+                resource.depends_tasks = [
+                    t for t in resource.depends_tasks if t is not task
+                ]
+            for resource in task.creates_resources:
+                resource.creates_task = None
+        for name, resource in self.resource_dict.items():
+            if (not isinstance(resource, Task) and
+                    resource.creates_task is None and
+                    not resource.depends_tasks):
+                self.resource_dict.pop(name)
+
+        # only keep the dependencies between the remaining tasks
+        for task in self.task_list:
+            task.upstream_tasks.intersection_update(task_subset)
+            task.downstream_tasks.intersection_update(task_subset)
+        self.invalidate_task_order()
 
     def get_networkx_graph(self, task_id_only=False):
+        """Export this task graph as a networkx.DiGraph. networkx is only
+        imported here because it takes a while to import and flo does
+        not need it otherwise.
+        """
+        try:
+            import networkx as nx
+        except ImportError:
+            raise CommandLineException(
+                "Exporting the task graph requires `pip install networkx`"
+            )
         graph = nx.DiGraph()
         if task_id_only:
             graph.add_nodes_from([task.id for task in self.task_list])
@@ -255,6 +481,7 @@ class TaskGraph(object):
         """Iterate over all tasks and make connections between tasks based on
         their dependencies.
         """
+        self.invalidate_task_order()
         for task in self.task_list:
             for resource in task.depends_resources:
                 if isinstance(resource.creates_task, Task):
@@ -278,20 +505,84 @@ class TaskGraph(object):
             yesno = 'y'
         return strtobool(yesno)
 
-    def clean(self, task_list=None, include_internals=False):
+    def contained_path(self, filename):
+        """Get the absolute path of `filename` after making sure that it is
+        inside the root directory, so that nothing outside of the
+        workflow is ever removed. A link at `filename` itself is not
+        followed because removing it only removes the link.
+        """
+        abs_filename = os.path.normpath(
+            os.path.join(self.root_directory, filename)
+        )
+        directory, name = os.path.split(abs_filename)
+        path = os.path.join(os.path.realpath(directory), name)
+        if not path.startswith(os.path.realpath(self.root_directory) + os.sep):
+            raise CommandLineException(
+                "Refusing to remove '%s', which is not inside '%s'" % (
+                    filename, self.root_directory,
+                )
+            )
+        return path
+
+    def remove(self, filename):
+        """Remove `filename` like `rm -rf` does after making sure that it is
+        inside the root directory. Returns whether there was anything
+        to remove.
+        """
+        path = self.contained_path(filename)
+        try:
+            return remove_path(path)
+        except OSError, error:
+            raise CommandLineException(
+                "Could not remove '%s': %s" % (filename, error.strerror)
+            )
+
+    def clean(self, task_list=None, include_internals=False, jobs=1):
         """Remove appropriate internal files managed by workflow as well as
-        any resulting files created by the specified `task_list`.
+        any resulting files created by the specified `task_list`. The
+        targets are removed on up to `jobs` threads at once.
         """
-        if os.path.exists(self.abs_state_path) and task_list is None:
-            os.remove(self.abs_state_path)
+
+        # check every target before removing anything
+        for task in task_list or self.task_list:
+            self.contained_path(task.creates)
         if include_internals:
-            shell.run(self.root_directory, "rm -rf %s" % self.internals_path)
+            self.contained_path(self.internals_path)
+
+        # the states of removed targets are forgotten all at once
+        if task_list is None:
+            self.storage.clear_states()
+            self.stored_states.clear()
+        else:
+            forgotten = False
+            for task in task_list:
+                for resource in task.creates_resources:
+                    if self.stored_states.pop(resource.name, None):
+                        forgotten = True
+            if forgotten:
+                self.storage.save(self.stored_states, self.task_durations)
+        if include_internals:
+            self.remove(self.internals_path)
             self.logger.info(
                 "removed %s" % colors.green(self.internals_path)
             )
+
         task_list = task_list or self.task_list
-        for task in task_list:
-            task.clean()
+        if jobs > 1 and len(task_list) > 1:
+            pool = ThreadPool(min(jobs, len(task_list)))
+            try:
+                removed = pool.map(Task.clean, task_list)
+            finally:
+                pool.close()
+        else:
+            removed = map(Task.clean, task_list)
+        n_removed = sum(removed)
+        message = "removed %d %s" % (
+            n_removed, "target" if n_removed == 1 else "targets",
+        )
+        if n_removed < len(task_list):
+            message += " (%d did not exist)" % (len(task_list) - n_removed)
+        self.logger.info(message)
 
     def status_json(self):
         result = {"nodes": [], "links": []}
@@ -311,6 +602,56 @@ class TaskGraph(object):
                 })
         return json.dumps(result)
 
+    def status_signature(self):
+        """Calculate an inexpensive signature of everything that the status
+        of this workflow depends on, which is the stat signature of
+        every resource and of the files where the states are stored.
+        Returns None if the status has to be recalculated anyway
+        because some resource does not have a reliable signature.
+        """
+        signatures = []
+        for name, resource in sorted(self.resource_dict.iteritems()):
+            if isinstance(resource, Task):
+                continue
+            signature = resource.calculate_signature()
+            if signature is None and resource.exists():
+                return None
+            signatures.append((name, signature))
+        for filename in self.storage.filenames:
+            try:
+                stat = os.stat(self.storage.abs_path(filename))
+            except OSError:
+                signatures.append((filename, None))
+            else:
+                signatures.append((filename, (
+                    stat.st_size, stat.st_mtime, stat.st_ino,
+                )))
+        return signatures
+
+    def reload_state(self):
+        """Forget the current state of every resource and reload the stored
+        states, which may have been changed by another flo process.
+        """
+        self.current_states.clear()
+        self.stored_states.clear()
+        self._load_state()
+
+    def weak_fingerprint_message(self, color=colors.yellow):
+        """List the resources whose state is calculated with a fingerprint
+        that does not read every byte, if there are any.
+        """
+        resources = [resource for resource in self.resource_dict.values()
+                     if resource.has_weak_fingerprint()]
+        if not resources:
+            return None
+        msg = "These resources have weak fingerprints, so changes to them\n"
+        msg += "that do not change their size may go unnoticed:"
+        for resource in sorted(resources, key=lambda r: r.name):
+            msg += "\n    %s (%s)" % (resource.name, resource.hash_method[0])
+        if color:
+            msg = color(msg)
+        return msg
+
     def duration_string(self, duration):
         if duration < 10 * 60:  # 10 minutes
             return "%.2f" % (duration) + " s"
@@ -321,7 +662,18 @@ class TaskGraph(object):
         else:
             return "%.2f" % (duration / 60 / 60 / 24) + " d"
 
-    def duration_message(self, tasks, color=colors.blue):
+    def duration_range_string(self, min_duration, max_duration):
+        if max_duration == min_duration == 0.0:
+            return "an indeterminate amount of time"
+        elif max_duration == min_duration:
+            return "approximately %s" % self.duration_string(min_duration)
+        else:
+            return "between %s and %s" % (
+                self.duration_string(min_duration),
+                self.duration_string(max_duration),
+            )
+
+    def duration_message(self, tasks, color=colors.blue, jobs=1):
         if tasks is None:
             tasks = list(self.iter_tasks())
         if len(tasks) == 0:
@@ -350,111 +702,155 @@ class TaskGraph(object):
                 len(tasks),
                 n_tasks,
             )
-        if max_duration == min_duration == 0.0:
-            msg += "which will take an indeterminate amount of time."
-        elif max_duration == min_duration:
-            msg += "which will take approximately %s." % (
-                self.duration_string(min_duration),
-            )
-        else:
-            msg += "which will take between %s and %s." % (
-                self.duration_string(min_duration),
-                self.duration_string(max_duration),
+        msg += "which will take %s." % (
+            self.duration_range_string(min_duration, max_duration),
+        )
+
+        # predict the time it takes to run the workflow in parallel
+        # by simulating the scheduler with the recorded durations
+        if jobs > 1 and max_duration > 0.0:
+            msg += "\nRunning %d tasks at a time, this will take %s." % (
+                jobs,
+                self.duration_range_string(
+                    self.predict_duration(tasks, jobs),
+                    self.predict_duration(list(self.iter_tasks(tasks)), jobs),
+                ),
             )
         if color:
             msg = color(msg)
         return msg
 
-    def _run_helper(self, starting_tasks, do_run_func, mock_run):
+    def estimate_durations(self, tasks):
+        """Estimate how long each of the `tasks` will take based on the
+        recorded durations. Tasks that have never been run are assumed
+        to take as long as an average task.
+        """
+        default = 1.0
+        if self.task_durations:
+            default = sum(self.task_durations.itervalues())
+            default /= len(self.task_durations)
+        return dict(
+            (task, self.task_durations.get(task.id, default))
+            for task in tasks
+        )
+
+    def predict_duration(self, tasks, jobs):
+        """Predict how long it takes to run `tasks` when up to `jobs` tasks
+        can run at the same time.
+        """
+        task_set = set(tasks)
+        ordered_tasks = [t for t in self.iter_tasks(tasks) if t in task_set]
+        durations = dict(
+            (task, self.task_durations.get(task.id, 0.0))
+            for task in ordered_tasks
+        )
+        scheduler = SimulatedScheduler(self, ordered_tasks, durations, jobs)
+        scheduler.run()
+        return scheduler.now
+
+    def _run_helper(self, starting_tasks, do_run_func, mock_run, jobs=1):
         """This is a convenience method that is used to slightly modify the
         behavior of running a workflow depending on the circumstances.
         """
-        self.logger.info(self.duration_message(starting_tasks))
-        for task in self.iter_tasks(starting_tasks):
-            if do_run_func(task):
-                if mock_run:
+        self.logger.info(self.duration_message(starting_tasks, jobs=jobs))
+        if mock_run:
+            for task in self.iter_tasks(starting_tasks):
+                if do_run_func(task):
                     task.mock_run()
-                else:
-                    try:
-                        task.timed_run()
-                    except (KeyboardInterrupt, ShellError), error:
-                        self.save_state(
-                            override_resource_states={task.name: ''},
-                        )
-                        sys.exit(getattr(error, 'exit_code', 1))
-        if not mock_run:
-            self.save_state()
-
-    def run_all(self, mock_run=False):
+            return
+
+        # run the tasks, up to `jobs` at a time. if anything goes
+        # wrong, store the state of everything that has been done so
+        # far but make sure the failed tasks are re-run next time
+        tasks = list(self.iter_tasks(starting_tasks))
+        self.start_worker_pool(tasks, jobs)
+        event_log = events.EventLog(self.abs_events_path)
+        self.saved_tasks = set()
+        scheduler = Scheduler(self, tasks, do_run_func, jobs=jobs,
+                              events=event_log)
+        self.scheduler = scheduler
+        try:
+            scheduler.run()
+        finally:
+            self.stop_worker_pool()
+            event_log.close()
+        error = scheduler.error
+        if isinstance(error, (KeyboardInterrupt, ShellError)):
+            self.save_state(override_resource_states=dict(
+                (task.name, '') for task in scheduler.failed
+            ))
+            sys.exit(getattr(error, 'exit_code', 1))
+        elif error is not None:
+            raise scheduler.exc_info[0], error, scheduler.exc_info[2]
+        self.save_state()
+
+    def run_all(self, mock_run=False, jobs=1):
         """Execute all tasks in the workflow, regardless of whether they are
         in sync or not.
         """
         def do_run_func(task):
             return True
-        self._run_helper(None, do_run_func, mock_run)
+        self._run_helper(None, do_run_func, mock_run, jobs=jobs)
 
-    def run_all_out_of_sync(self, mock_run=False):
+    def run_all_out_of_sync(self, mock_run=False, jobs=1):
         """Execute all tasks in the workflow that are out of sync at runtime.
         """
         def do_run_func(task):
             return not task.in_sync()
-        self._run_helper(self.get_out_of_sync_tasks(), do_run_func, mock_run)
-
-    @property
-    def abs_state_path(self):
-        """Convenience property for accessing state storage location"""
-        return os.path.join(self.root_directory, self.state_path)
+        self._run_helper(self.get_out_of_sync_tasks(), do_run_func, mock_run,
+                         jobs=jobs)
 
     @property
-    def abs_duration_path(self):
-        """Convenience property for accessing duration storage location"""
-        return os.path.join(self.root_directory, self.duration_path)
+    def abs_internals_path(self):
+        """Convenience property for accessing the internals location"""
+        return os.path.join(self.root_directory, self.internals_path)
 
     @property
     def abs_log_path(self):
         """Convenience property for accessing log storage location"""
         return os.path.join(self.root_directory, self.log_path)
 
+    @property
+    def abs_events_path(self):
+        """Convenience property for accessing the events location"""
+        return os.path.join(self.root_directory, self.events_path)
+
     @property
     def abs_archive_dir(self):
         """Convenience property for accessing the archive location"""
         return os.path.join(self.root_directory, self.archive_dir)
 
-    def read_from_storage(self, storage_location):
-        dictionary = {}
-        if os.path.exists(storage_location):
-            with open(storage_location) as stream:
-                reader = csv.reader(stream)
-                for row in reader:
-                    dictionary[row[0]] = row[1]
-        return dictionary
-
-    def write_to_storage(self, dictionary, storage_location):
-        with open(storage_location, 'w') as stream:
-            writer = csv.writer(stream)
-            for item in dictionary.iteritems():
-                writer.writerow(item)
+    def get_record_from_storage(self, resource):
+        return self.stored_states.get(resource)
 
     def get_state_from_storage(self, resource):
-        if os.path.exists(self.abs_state_path):
-            with open(self.abs_state_path) as stream:
-                reader = csv.reader(stream)
-                for row in reader:
-                    if row[0] == resource:
-                        return row[1]
+        record = self.get_record_from_storage(resource)
+        if record:
+            return record[0]
+
+    def get_signature_from_storage(self, resource):
+        record = self.get_record_from_storage(resource)
+        if record and len(record) > 1:
+            return record[1]
 
     def _load_state(self):
         """Load the states of all resources (files, databases, etc). If the
         state file hasn't been stored yet, nothing happens. This also
         loads the duration statistics on this task.
         """
-        self.task_durations.update(
-            self.read_from_storage(self.abs_duration_path)
-        )
+        states, durations = self.storage.load()
+        self.stored_states.update(states)
+        self.task_durations.update(durations)
 
-        # typecast the task_durations
-        for task_id, duration in self.task_durations.iteritems():
-            self.task_durations[task_id] = float(duration)
+    def get_current_records(self, resources):
+        """Get the [state, signature] of each resource, keyed by name"""
+        return dict(
+            (resource.name, [
+                resource.get_current_state(),
+                resource.get_current_signature(),
+            ])
+            for resource in resources
+        )
 
     def save_state(self, override_resource_states=None):
         """Save the states of all resources (files, databases, etc). If the
@@ -464,25 +860,62 @@ class TaskGraph(object):
         interrupts, for example.
         """
 
-        # read all of the old storage states first, then over write
-        # the old states with the current states before writing to a
-        # CSV. this is important for situations where a subgraph is
-        # selected to run
-        after_resource_states = self.read_from_storage(self.abs_state_path)
-        for name, resource in self.resource_dict.iteritems():
-            after_resource_states[name] = resource.get_current_state()
+        # start with all of the old storage states first, then over
+        # write the old states with the current states before
+        # storing them. this is important for situations where a
+        # subgraph is selected to run. the stat signature of each
+        # resource is stored next to its state to avoid rehashing
+        # unchanged files
+        after_resource_states = dict(self.stored_states)
+        after_resource_states.update(
+            self.get_current_records(self.resource_dict.itervalues())
+        )
 
         # if override states are provided, update the resources
         # accordingly
         if isinstance(override_resource_states, dict):
-            after_resource_states.update(override_resource_states)
+            for name, state in override_resource_states.iteritems():
+                after_resource_states[name] = [state]
 
-        self.write_to_storage(after_resource_states, self.abs_state_path)
-        self.write_to_storage(self.task_durations, self.abs_duration_path)
+        self.storage.save(after_resource_states, self.task_durations)
+        self.stored_states = after_resource_states
 
-    def write_archive(self, exclude_internals=False):
-        """Method to backup the current workflow
+    def save_task_state(self, task):
+        """Save the states of the resources of `task` as soon as it has
+        finished running, if the storage backend supports it. The tasks
+        that directly depend on `task`, as well as the tasks that share
+        a dependency with `task` that changed and have not been run
+        yet, are marked as out of sync until they have been run, too,
+        so that nothing is missed if flo is killed part way through a
+        run.
+
+        This deliberately does not update self.stored_states, which
+        must continue to reflect the states before this run.
         """
+        if not self.storage.incremental:
+            return
+        states = self.get_current_records(
+            list(task.iter_resources()) + [task]
+        )
+        stale_tasks = set(task.downstream_tasks)
+        for resource in task.depends_resources:
+            state = self.get_state_from_storage(resource.name)
+            if states[resource.name][0] != state:
+                stale_tasks.update(resource.depends_tasks)
+        stale_tasks.discard(task)
+        self.saved_tasks.add(task)
+        for stale_task in stale_tasks - self.saved_tasks:
+            states[stale_task.name] = ['']
+        self.storage.save_task(
+            states, task.id, self.task_durations.get(task.id),
+        )
+
+    def write_archive(self, exclude_internals=False, codec=None, level=None,
+                      jobs=1):
+        """Method to backup the current workflow in a tarball that is
+        compressed with `codec` at `level` on `jobs` threads
+        """
+        codec = archives.get_codec(codec)
 
         # for now, create archives based on the date.
         #
@@ -492,37 +925,217 @@ class TaskGraph(object):
         now = datetime.datetime.now()
         archive_name = os.path.join(
             self.abs_archive_dir,
-            "%s.tar.bz2" % now.strftime("%Y%m%d%H%M%S"),
+            now.strftime("%Y%m%d%H%M%S") + codec.extension,
+        )
+
+        # filenames are ordered here so that the corresponding archive
+        # will have a consistent md5 hash (which is used in functional
+        # tests).
+        filenames = list(self.iter_archive_files(exclude_internals,
+                                                 directories=True))
+        for filename in self.get_archive_filenames(exclude_internals):
+            if not os.path.exists(os.path.join(self.root_directory, filename)):
+                self.logger.info(colors.yellow(
+                    "skipping '%s', which does not exist" % filename
+                ))
+        archives.write_tar(
+            archive_name, self.root_directory, filenames, codec,
+            level=level, threads=jobs, logger=self.logger,
+            tasks=self.get_archive_tasks(),
         )
+        return archive_name
 
-        # get the set of all filenames that should be archived based
-        # on the current workflow specification
+    def get_archive_filenames(self, exclude_internals=False):
+        """Get the sorted list of all filenames that should be archived based
+        on the current workflow specification
+        """
         all_filenames = set([os.path.basename(self.config_path)])
         if not exclude_internals:
-            all_filenames.update(set([
-                self.state_path,
-                self.duration_path,
-                self.log_path,
-            ]))
+            all_filenames.update(set(self.storage.filenames))
+            all_filenames.add(self.log_path)
         for task in self.task_list:
             all_filenames.update(task.get_all_filenames())
+        return sorted(all_filenames)
+
+    def get_archive_tasks(self):
+        """Get the files that every task creates along with the stored states
+        of the task, what it creates and what it depends on, keyed by
+        task id. These are stored in the index of archives so that
+        single tasks can be restored later.
+        """
+        tasks = {}
+        for task in self.task_list:
+            states = {}
+            for resource in task.creates_resources + [task]:
+                state = self.get_state_from_storage(resource.name)
+                if state:
+                    states[resource.name] = state
+            depends = {}
+            for resource in task.depends_resources:
+                state = self.get_state_from_storage(resource.name)
+                if state:
+                    depends[resource.name] = state
+            tasks[task.id] = {
+                'creates': sorted(
+                    os.path.normpath(resource.get_filename())
+                    for resource in task.creates_resources
+                ),
+                'states': states,
+                'depends': depends,
+            }
+        return tasks
+
+    def iter_archive_files(self, exclude_internals=False, directories=False):
+        """Iterate over every file that should be archived, including the
+        files in directories, relative to the root directory. The
+        directories themselves are included before their contents if
+        `directories` is True, which preserves empty directories.
+        """
+        for filename in self.get_archive_filenames(exclude_internals):
+            abs_filename = os.path.join(self.root_directory, filename)
+            if os.path.isfile(abs_filename):
+                yield os.path.normpath(filename)
+            for root, subdirectories, filenames in os.walk(abs_filename):
+                subdirectories.sort()
+                if directories:
+                    yield os.path.relpath(root, self.root_directory)
+                for name in sorted(filenames):
+                    yield os.path.relpath(os.path.join(root, name),
+                                          self.root_directory)
+
+    def get_full_file_states(self):
+        """Get the states that flo already calculated for file resources that
+        hash every byte, keyed by filename. These double as the keys of
+        the objects in incremental archives.
+        """
+        states = {}
+        for resource in self.resource_dict.itervalues():
+            if (isinstance(resource, FileSystem) and
+                    not resource.has_weak_fingerprint() and
+                    os.path.isfile(resource.resource_path)):
+                states[os.path.normpath(resource.name)] = \
+                    resource.get_current_state()
+        return states
+
+    def write_snapshot(self, exclude_internals=False):
+        """Back up the current workflow incrementally by storing the files
+        that changed since the last snapshot in a content-addressed
+        object store and writing a manifest of all files
+        """
+        now = datetime.datetime.now()
+        manifest_name = os.path.join(
+            self.abs_archive_dir,
+            "%s.manifest" % now.strftime("%Y%m%d%H%M%S"),
+        )
+        store = archives.ObjectStore(
+            os.path.join(self.root_directory, self.objects_dir),
+            self.root_directory,
+        )
+        filenames = list(self.iter_archive_files(exclude_internals))
+        n_objects, n_bytes = store.write_manifest(
+            manifest_name, filenames, self.get_full_file_states(),
+            map_func=self.hash_map,
+        )
+        self.logger.info("stored %d files in %s (%d new objects, %s)" % (
+            len(filenames),
+            colors.green(os.path.relpath(manifest_name, self.root_directory)),
+            n_objects,
+            archives.format_size(n_bytes),
+        ))
 
-        # create the archive. filenames are ordered here so that the
-        # corresponding archive will have a consistent md5 hash (which is
-        # used in functional tests).
-        command = "tar cjf %s %s" % (
-            archive_name,
-            ' '.join(sorted(all_filenames)),
+    def restore_snapshot(self, manifest):
+        """Restore the files in the incremental archive `manifest` that
+        differ from the files on disk
+        """
+        store = archives.ObjectStore(
+            os.path.join(self.root_directory, self.objects_dir),
+            self.root_directory,
         )
-        self.logger.info(colors.bold_white(command))
-        shell.run(self.root_directory, command)
+        n_restored, n_unchanged = store.restore_manifest(
+            os.path.join(self.root_directory, manifest),
+        )
+        self.logger.info("restored %d files from %s (%d unchanged)" % (
+            n_restored, colors.green(manifest), n_unchanged,
+        ))
 
-    def restore_archive(self, archive):
+    def restore_archive(self, archive, task_id=None):
         """Method to restore a previous archived workflow specified in
         `archive`. The archive path should be relative to the root of
-        the project.
+        the project. Only the files that `task_id` creates are restored
+        if it is given.
+        """
+        if task_id is not None:
+            return self.restore_task_from_archive(archive, task_id)
+        if archive.endswith('.manifest'):
+            return self.restore_snapshot(archive)
+        archives.extract_tar(
+            os.path.join(self.root_directory, archive), self.root_directory,
+            logger=self.logger,
+        )
+
+    def restore_task_from_archive(self, archive, task_id):
+        """Restore the files that `task_id` created when `archive` was
+        written, along with their stored states, so that the task is in
+        sync again without rerunning it as long as what it depends on
+        has not changed since. Every task downstream of it is out of
+        sync, because it may have been run on different files. Only
+        the parts of the archive that contain these files are
+        decompressed.
         """
-        archive_name = os.path.join(self.root_directory, archive)
-        command = "tar xjf %s" % archive_name
-        self.logger.info(colors.bold_white(command))
-        shell.run(self.root_directory, command)
+        abs_archive = os.path.join(self.root_directory, archive)
+        index = None
+        if not archive.endswith('.manifest'):
+            index = archives.read_index(abs_archive)
+        if index is None:
+            raise CommandLineException(
+                "'%s' has no index to restore a single task from" % archive
+            )
+        try:
+            task = index['tasks'][task_id]
+        except KeyError:
+            raise CommandLineException(
+                "Task '%s' is not in archive '%s'" % (task_id, archive)
+            )
+
+        def select(name):
+            for filename in task['creates']:
+                if name == filename or name.startswith(filename + '/'):
+                    return True
+            return False
+
+        archives.extract_tar(
+            abs_archive, self.root_directory, select=select,
+            logger=self.logger,
+        )
+        for name, state in task['states'].iteritems():
+            self.stored_states[name] = [state]
+        current_task = self.task_dict.get(task_id)
+        if current_task is not None:
+            depends = task.get('depends')
+            if depends is None or not all(
+                resource.state_matches(depends.get(resource.name))
+                for resource in current_task.depends_resources
+            ):
+                self.stored_states[current_task.name] = ['']
+            for downstream_task in self.descendants(current_task):
+                self.stored_states[downstream_task.name] = ['']
+        self.storage.save(self.stored_states, self.task_durations)
+
+    def list_archive(self, archive):
+        """Log the files in `archive` and their sizes"""
+        abs_archive = os.path.join(self.root_directory, archive)
+        if archive.endswith('.manifest'):
+            store = archives.ObjectStore(
+                os.path.join(self.root_directory, self.objects_dir),
+                self.root_directory,
+            )
+            members = store.list_manifest(abs_archive)
+        else:
+            members = archives.list_members(abs_archive)
+        total = 0
+        for name, size in members:
+            self.logger.info("%10s  %s" % (archives.format_size(size), name))
+            total += size
+        self.logger.info(colors.bold_white("%d files, %s" % (
+            len(members), archives.format_size(total),
+        )))
@@ -0,0 +1,221 @@
+"""Execute the tasks in a TaskGraph on a bounded number of worker
+threads so that independent branches of a workflow can run at the
+same time.
+"""
+
+import sys
+import heapq
+import threading
+import Queue
+
+from ..logger import TailBuffer
+
+
+def critical_path_lengths(tasks, durations):
+    """Calculate the total duration of the longest chain of tasks that
+    starts with each task and ends at the end of the workflow. `tasks`
+    must be in an order that obeys their dependencies.
+    """
+    lengths = {}
+    for task in reversed(tasks):
+        downstream_lengths = [lengths[t] for t in task.downstream_tasks
+                              if t in lengths]
+        lengths[task] = durations[task] + max(downstream_lengths or [0.0])
+    return lengths
+
+
+class Scheduler(object):
+    """Start every task as soon as all of its upstream tasks have finished,
+    running at most `jobs` tasks at a time. Tasks that are ready at
+    the same time are started in the order they are passed in, which
+    means that `jobs=1` runs tasks in the deterministic order of
+    TaskGraph.iter_tasks.
+
+    When more than one task can run at a time, ready tasks are instead
+    started in order of their critical path length (the recorded
+    duration of the longest chain of tasks that depends on them) so
+    that long chains of tasks do not start last and hold everything
+    up.
+    """
+
+    # how often (in seconds) the main thread wakes up while it waits
+    # for running tasks so that keyboard interrupts are not ignored
+    poll_interval = 0.1
+
+    def __init__(self, task_graph, tasks, do_run_func, jobs=1, events=None):
+        self.task_graph = task_graph
+        self.tasks = list(tasks)
+        self.do_run_func = do_run_func
+        self.jobs = max(1, jobs)
+        self.order = dict((task, i) for i, task in enumerate(self.tasks))
+        self.critical_path = {}
+        if self.jobs > 1:
+            self.critical_path = critical_path_lengths(
+                self.tasks, task_graph.estimate_durations(self.tasks),
+            )
+
+        # keep track of what happened to each task so that the
+        # TaskGraph can store the appropriate state when things fail
+        self.completed = []
+        self.skipped = []
+        self.failed = []
+        self.exc_info = None
+
+        # the last output of every task that failed, keyed by task,
+        # which is used to summarize the run in notification emails
+        self.failed_output = {}
+
+        # lifecycle events of the tasks are written to this EventLog
+        # so that other processes can follow the progress of the run
+        self.events = events
+
+        self._ready = []
+        self._results = Queue.Queue()
+
+    @property
+    def error(self):
+        """The first exception raised by a task, if any"""
+        if self.exc_info is not None:
+            return self.exc_info[1]
+
+    def priority(self, task):
+        """Ready tasks with the smallest priority are started first"""
+        return (-self.critical_path.get(task, 0.0), self.order[task])
+
+    def publish(self, event, task=None, **data):
+        """Publish an event about `task` (or the whole run) if anyone can be
+        listening. This is always called from the main thread.
+        """
+        if self.events is not None:
+            self.events.write(event, task, **data)
+
+    def run(self):
+        """Run all of the tasks, stopping as soon as any task fails and
+        waiting for the tasks that are already running to finish.
+        """
+        self.publish('run', tasks=[task.id for task in self.tasks],
+                     jobs=self.jobs)
+        self._n_waiting = {}
+        for task in self.tasks:
+            upstream = [t for t in task.upstream_tasks if t in self.order]
+            self._n_waiting[task] = len(upstream)
+            if not upstream:
+                self._push_ready(task)
+
+        n_running = 0
+        while n_running or (self._ready and self.exc_info is None):
+            while (self._ready and n_running < self.jobs and
+                   self.exc_info is None):
+                task = self._pop_ready()
+                if self.do_run_func(task):
+                    self.publish('started', task)
+                    self._start(task)
+                    n_running += 1
+                else:
+                    self.skipped.append(task)
+                    self.publish('skipped', task)
+                    self._release(task)
+            if n_running:
+                self._finish(*self._wait())
+                n_running -= 1
+        self.publish('done', successful=self.exc_info is None)
+
+    def _push_ready(self, task):
+        self.publish('queued', task)
+        heapq.heappush(self._ready, (self.priority(task), task))
+
+    def _pop_ready(self):
+        return heapq.heappop(self._ready)[-1]
+
+    def _release(self, task):
+        """Mark the downstream tasks of `task` as ready if `task` was the
+        last thing they were waiting for.
+        """
+        for downstream_task in task.downstream_tasks:
+            if downstream_task in self._n_waiting:
+                self._n_waiting[downstream_task] -= 1
+                if self._n_waiting[downstream_task] == 0:
+                    self._push_ready(downstream_task)
+
+    def _start(self, task):
+        # run tasks directly when only one task can be run at a time
+        # so that the output streams to the terminal as before and
+        # keyboard interrupts are handled in the main thread
+        if self.jobs == 1:
+            self._results.put(self._run_task(task))
+        else:
+            thread = threading.Thread(target=self._run_task_thread,
+                                      args=(task,))
+            thread.daemon = True
+            thread.start()
+
+    def _run_task(self, task):
+        output = TailBuffer(self.task_graph.notify_bytes)
+        with self.task_graph.logger.tailed(output):
+            try:
+                task.timed_run()
+            except (KeyboardInterrupt, Exception):
+                self.failed_output[task] = output
+                return task, sys.exc_info()
+        return task, None
+
+    def _run_task_thread(self, task):
+        with self.task_graph.logger.buffered():
+            result = self._run_task(task)
+        self._results.put(result)
+
+    def _wait(self):
+        while True:
+            try:
+                return self._results.get(timeout=self.poll_interval)
+            except Queue.Empty:
+                pass
+            except KeyboardInterrupt:
+                # the running commands receive the interrupt, too, so
+                # stop starting new tasks and wait for them to finish
+                if self.exc_info is None:
+                    self.exc_info = sys.exc_info()
+
+    def on_success(self, task):
+        """Called in the main thread as soon as `task` has run successfully
+        """
+        self.task_graph.save_task_state(task)
+
+    def _finish(self, task, exc_info):
+        if exc_info is None:
+            self.completed.append(task)
+            self.on_success(task)
+            self.publish('finished', task,
+                         duration=self.task_graph.task_durations.get(task.id))
+            self._release(task)
+        else:
+            self.failed.append(task)
+            self.publish('failed', task)
+            if self.exc_info is None:
+                self.exc_info = exc_info
+
+
+class SimulatedScheduler(Scheduler):
+    """Pretend to run the tasks, assuming that each task takes as long as
+    specified in `durations`. This is used to predict how long it
+    takes to run a workflow with `jobs` tasks at a time.
+    """
+
+    def __init__(self, task_graph, tasks, durations, jobs=1):
+        super(SimulatedScheduler, self).__init__(
+            task_graph, tasks, lambda task: True, jobs=jobs,
+        )
+        self.durations = durations
+        self.now = 0.0
+        self._running = []
+
+    def on_success(self, task):
+        pass
+
+    def _start(self, task):
+        finish_time = self.now + self.durations[task]
+        heapq.heappush(self._running, (finish_time, self.order[task], task))
+
+    def _wait(self):
+        self.now, index, task = heapq.heappop(self._running)
+        return task, None
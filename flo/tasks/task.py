@@ -6,8 +6,10 @@ import copy
 from ..exceptions import InvalidTaskDefinition, CommandLineException
 from .. import colors
 from .. import shell
+from .. import workers
 from .. import resources
 from .. import templates
+from ..resources import hashes
 from ..types import UniqueOrderedList
 
 
@@ -49,10 +51,21 @@ class Task(resources.base.BaseResource):
                 "every task must define a `command`",
                 self.yaml_data,
             )
+        if not isinstance(kwargs.get('shell', False), bool):
+            raise InvalidTaskDefinition(
+                "`shell` must be true or false",
+                self.yaml_data,
+            )
 
         # remember other attributes of this Task for rendering
         # purposes below
         self.attrs = kwargs
+        self.command_type = kwargs.get('command_type', 'shell')
+        if self.command_type not in ('shell', 'python'):
+            raise InvalidTaskDefinition(
+                "`command_type` must be either `shell` or `python`",
+                self.yaml_data,
+            )
 
         # render the creates and depends templates as necessary. this
         # is to address issue #33
@@ -71,6 +84,21 @@ class Task(resources.base.BaseResource):
         # the state of this command and render the jinja template for
         # the command
         self.command = self.render_command_template()
+        if self.command_type == 'python':
+            for command in self.command_list:
+                try:
+                    workers.parse_command(command)
+                except ValueError, error:
+                    raise InvalidTaskDefinition(str(error), self.yaml_data)
+
+        # figure out how the state of each resource associated with
+        # this task should be calculated
+        self.hash_algorithms = self.get_resource_settings(
+            'hash', hashes.validate,
+        )
+        self.fingerprints = self.get_resource_settings(
+            'fingerprint', hashes.validate_fingerprint,
+        )
 
         # add this task to the task graph
         self.graph.add(self)
@@ -184,8 +212,8 @@ class Task(resources.base.BaseResource):
             all_filenames.add(resource.get_filename())
         return all_filenames
 
-    def get_current_state(self):
-        """Get the state of this task"""
+    def calculate_current_state(self, algorithm=None, fingerprint=None):
+        """Calculate the state of this task"""
         # write the data for this task to a stream so that we can use
         # the machinery in self.get_stream_state to calculate the
         # state
@@ -193,8 +221,15 @@ class Task(resources.base.BaseResource):
         keys = self.attrs.keys()
         keys.sort()
         for k in keys:
-            msg += k + str(self.attrs[k])
-        return self.get_stream_state(StringIO.StringIO(msg))
+            if k not in self.graph.settings_keys:
+                msg += k + str(self.attrs[k])
+        return self.get_stream_state(StringIO.StringIO(msg), algorithm,
+                                     fingerprint)
+
+    def invalidate_creates_states(self):
+        """Forget the cached states of the resources this task creates"""
+        for resource in self.creates_resources:
+            resource.invalidate_state()
 
     def in_sync(self):
         """Test whether this task is in sync with the stored state and
@@ -216,16 +251,29 @@ class Task(resources.base.BaseResource):
         )
 
     def run(self, command):
-        """Run the specified shell command using Fabric-like behavior"""
-        return shell.run(self.root_directory, command)
+        """Run the specified shell command using Fabric-like behavior or, for
+        python tasks, call the specified function in a python worker
+        """
+        if self.command_type == 'python':
+            return self.graph.get_worker_pool().run(command)
+        return shell.run(self.root_directory, command,
+                         use_shell=self.attrs.get('shell'))
 
-    def clean_command(self):
-        return "rm -rf %s" % self.creates
+    @property
+    def python_modules(self):
+        """The modules that the commands of a python task import"""
+        if self.command_type != 'python':
+            return []
+        return [workers.parse_command(command)[0]
+                for command in self.command_list]
 
     def clean(self):
-        """Remove the specified target"""
-        self.run(self.clean_command())
-        self.graph.logger.info("removed %s" % self.creates_message())
+        """Remove the specified target. Returns whether there was anything
+        to remove.
+        """
+        removed = self.graph.remove(self.creates)
+        self.invalidate_creates_states()
+        return removed
 
     def mock_run(self):
         """Mock run this task by displaying output as if it were run"""
@@ -248,10 +296,14 @@ class Task(resources.base.BaseResource):
                 "dependencies are correct for this task."
             ))
 
-        # run each command for this task
-        for command in self.command_list:
-            self.graph.logger.info(self.command_message(command))
-            self.run(command)
+        # run each command for this task. the `creates` resources
+        # (probably) change here, even if a command fails
+        try:
+            for command in self.command_list:
+                self.graph.logger.info(self.command_message(command))
+                self.run(command)
+        finally:
+            self.invalidate_creates_states()
 
         # confirm that the creates resources exists on the filesystem
         if not all(resource.exists() for resource in self.creates_resources):
@@ -269,6 +321,34 @@ class Task(resources.base.BaseResource):
         # store the duration on the graph object
         self.graph.task_durations[self.id] = self.duration
 
+    def get_resource_settings(self, key, validate):
+        """Settings like `hash` can either be a single value that is used for
+        all of the resources of this task or a mapping from resource
+        names to values. This returns a dictionary of the value for
+        each resource that has one, checking each value with
+        `validate`.
+        """
+        spec = self.attrs.get(key)
+        if spec is None:
+            return {}
+        if isinstance(spec, (str, unicode)):
+            spec = dict((name, spec)
+                        for name in self.creates_list + self.depends_list)
+        elif not isinstance(spec, dict):
+            raise InvalidTaskDefinition(
+                "`%s` must be a string or a mapping from resources to "
+                "strings" % key,
+                self.yaml_data,
+            )
+        settings = {}
+        for name, value in spec.iteritems():
+            try:
+                validate(value)
+            except CommandLineException, error:
+                raise InvalidTaskDefinition(str(error), self.yaml_data)
+            settings[self.render_template(name)] = value
+        return settings
+
     def render_template(self, template):
         """Render a `template` using self.attrs as a template context.
         """
@@ -1,16 +1,55 @@
 import os
+import re
 
 import jinja2
 
 from ..exceptions import JinjaTemplateError, JinjaRenderError
+from ..decorators import lru_cache
 
+# every template string is compiled in the same environment and the
+# compiled templates are cached because compiling is by far the most
+# expensive part of rendering the templates in a flo.yaml
+string_environment = jinja2.Environment(undefined=jinja2.StrictUndefined)
+file_environment = jinja2.Environment(loader=jinja2.FileSystemLoader(
+    os.path.dirname(os.path.abspath(__file__))
+))
 
-def render_from_string(template_string, **context_dict):
-    env = jinja2.Environment(undefined=jinja2.StrictUndefined)
+JINJA_DELIMITERS = ('{{', '{%', '{#')
+
+# line boundaries other than \n, \r\n and \r, which some versions of
+# jinja also treat as newlines
+OTHER_NEWLINES_RE = re.compile(u'[\x0b\x0c\x1c-\x1e\x85\u2028\u2029]')
+
+
+def is_template(template_string):
+    """Check whether `template_string` contains anything for jinja to do"""
+    if not isinstance(template_string, basestring):
+        return True
+    for delimiter in JINJA_DELIMITERS:
+        if delimiter in template_string:
+            return True
+    return False
+
+
+@lru_cache(maxsize=4096)
+def compile_template(template_string):
     try:
-        template_obj = env.from_string(template_string)
+        return string_environment.from_string(template_string)
     except jinja2.exceptions.TemplateSyntaxError, error:
         raise JinjaTemplateError(template_string, error)
+
+
+def render_from_string(template_string, **context_dict):
+    # plain strings render to themselves, except that jinja returns
+    # unicode with normalized newlines and no trailing newline
+    if not is_template(template_string):
+        text = unicode(template_string)
+        if not OTHER_NEWLINES_RE.search(text):
+            text = text.replace(u'\r\n', u'\n').replace(u'\r', u'\n')
+            if text.endswith(u'\n'):
+                text = text[:-1]
+            return text
+    template_obj = compile_template(template_string)
     try:
         return template_obj.render(**context_dict)
     except jinja2.exceptions.UndefinedError, error:
@@ -18,8 +57,5 @@ def render_from_string(template_string, **context_dict):
 
 
 def render_from_file(template_file, **context_dict):
-    this_directory = os.path.dirname(os.path.abspath(__file__))
-    loader = jinja2.FileSystemLoader(this_directory)
-    env = jinja2.Environment(loader=loader)
-    template_obj = env.get_template(template_file)
+    template_obj = file_environment.get_template(template_file)
     return template_obj.render(**context_dict)
@@ -25,15 +25,19 @@ var link = svg.selectAll(".link")
     .attr("class", "link")
     .style("stroke-width", 3);
 
+function node_class(d) {
+    if (d.state)
+	return "node " + d.state;
+    if (d.in_sync)
+	return "node synced";
+    return "node not_synced";
+}
+
 var node = svg.selectAll(".node")
     .data(document.graph.nodes)
     .enter()
     .append("circle")
-    .attr("class", function (d) { 
-	if (d.in_sync) 
-	    return "node synced";
-	return "node not_synced"
-    })
+    .attr("class", node_class)
     .attr("r", 10)
     .call(force.drag);
 
@@ -52,7 +56,7 @@ force.on("tick", function() {
 
 // add a color legend
 var legend = svg.selectAll("g.color_legend")
-    .data(["synced", "not_synced"])
+    .data(["synced", "not_synced", "queued", "running", "failed"])
     .enter()
     .append("g")
     .attr("class", "color_legend");
@@ -71,3 +75,69 @@ legend.each(function (d, i) {
 	.attr("dy", "0.35em")
 	.text(d);
 })
+
+// poll the status of the workflow and recolor the nodes when it
+// changes. the server only recalculates the status when files change
+// and answers with 304 Not Modified when nothing changed, so this is
+// cheap for the server and the browser alike
+var poll_interval = 2000;
+function update_status(callback) {
+    d3.json("status.json", function (error, graph) {
+	if (!error) {
+	    var in_sync = {};
+	    graph.nodes.forEach(function (d) {
+		in_sync[d.task_id] = d.in_sync;
+	    });
+	    node.each(function (d) {
+		if (d.task_id in in_sync)
+		    d.in_sync = in_sync[d.task_id];
+	    }).attr("class", node_class);
+	}
+	if (callback)
+	    callback();
+    });
+}
+function poll_status() {
+    update_status(function () {
+	setTimeout(poll_status, poll_interval);
+    });
+}
+setTimeout(poll_status, poll_interval);
+
+// follow the progress of `flo run` as it happens. the server pushes
+// the lifecycle events of every task as they are written by `flo run`
+var task_states = {
+    queued: "queued",
+    started: "running",
+    failed: "failed",
+    finished: null,
+    skipped: null
+};
+function handle_event(event) {
+    if (event.event === "run") {
+	node.each(function (d) { d.state = null; });
+    }
+    else if (event.event === "done") {
+	node.each(function (d) {
+	    if (d.state !== "failed")
+		d.state = null;
+	});
+	update_status();
+	return;
+    }
+    else if (event.task_id !== undefined) {
+	node.filter(function (d) { return d.task_id === event.task_id; })
+	    .each(function (d) {
+		d.state = task_states[event.event];
+		if (event.event === "finished" || event.event === "skipped")
+		    d.in_sync = true;
+	    });
+    }
+    node.attr("class", node_class);
+}
+if (window.EventSource) {
+    var events = new EventSource("events");
+    events.onmessage = function (message) {
+	handle_event(JSON.parse(message.data));
+    };
+}
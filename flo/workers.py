@@ -0,0 +1,226 @@
+"""Module for running the commands of python tasks (`command_type:
+python`) in a pool of long-lived worker processes. Every worker is
+forked once per `flo run` and keeps the modules that it imports, which
+saves starting the interpreter and importing packages like numpy or
+scipy for every command.
+"""
+import os
+import sys
+import imp
+import shlex
+import fcntl
+import signal
+import traceback
+import importlib
+import Queue
+import multiprocessing
+from multiprocessing import reduction
+
+from . import exceptions
+from . import shell
+
+
+def parse_command(command):
+    """Split a `module:function arg1 arg2 ...` command into the name of the
+    module, the name of the function and the list of arguments. The
+    module is either a dotted module name or the path of a python
+    file. Raises ValueError if `command` does not name a function.
+    """
+    # shlex does not support unicode in python 2
+    if isinstance(command, unicode):
+        command = command.encode('utf-8')
+    args = shlex.split(command)
+    if args:
+        module_name, sep, function_name = args[0].rpartition(':')
+        if module_name and function_name:
+            return module_name, function_name, args[1:]
+    raise ValueError(
+        "python commands must look like `module:function arg1 arg2 ...`"
+    )
+
+
+# modules that are loaded from a python file are stored by their
+# absolute path so that every file is only loaded once in each worker
+_file_modules = {}
+
+
+def import_module(module_name):
+    """Import a module by its dotted name or load it from a python file"""
+    if not module_name.endswith('.py'):
+        return importlib.import_module(module_name)
+    path = os.path.abspath(module_name)
+    if path not in _file_modules:
+        name = "_flo_module_%d" % len(_file_modules)
+        _file_modules[path] = imp.load_source(name, path)
+    return _file_modules[path]
+
+
+def call(command):
+    """Call the function named by `command` with the arguments from
+    `command` and return the exit status that a command line script
+    would have.
+    """
+    try:
+        module_name, function_name, args = parse_command(command)
+        function = getattr(import_module(module_name), function_name)
+        sys.argv = [module_name] + args
+        function(*args)
+    except SystemExit, error:
+        if error.code is None or isinstance(error.code, int):
+            return error.code or 0
+        sys.stderr.write("%s\n" % error.code)
+        return 1
+    except KeyboardInterrupt:
+        return 128 + signal.SIGINT
+    except Exception:
+        # leave this function out of the traceback
+        exc_type, error, exc_traceback = sys.exc_info()
+        traceback.print_exception(exc_type, error, exc_traceback.tb_next)
+        return 1
+    return 0
+
+
+def _worker(connection, root_directory, preload_modules):
+    """The main loop of a worker process. Output is discarded except
+    while a command is running, when it goes to the file descriptor
+    that is sent along with the command.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    os.chdir(root_directory)
+    sys.path.insert(0, root_directory)
+
+    # warm up while waiting for the first command. any errors are
+    # reported when a command that uses the module is run
+    for module_name in preload_modules:
+        try:
+            import_module(module_name)
+        except BaseException:
+            pass
+
+    stdout, stderr, argv = sys.stdout, sys.stderr, sys.argv
+    while True:
+        try:
+            command = connection.recv()
+            if command is None:
+                break
+            output = reduction.recv_handle(connection)
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        # line buffer the output so that it is logged as it happens
+        os.dup2(output, 1)
+        os.dup2(output, 2)
+        os.close(output)
+        sys.stdout = sys.stderr = os.fdopen(os.dup(1), 'w', 1)
+        try:
+            status = call(command)
+        finally:
+            sys.stdout.close()
+            stdout.flush()
+            stderr.flush()
+            sys.stdout, sys.stderr, sys.argv = stdout, stderr, argv
+            os.dup2(devnull, 1)
+            os.dup2(devnull, 2)
+            os.chdir(root_directory)
+        connection.send(status)
+
+
+class WorkerPool(object):
+    """A fixed number of worker processes that run python commands one at
+    a time. `preload_modules` are imported by every worker as soon as
+    it starts.
+    """
+
+    def __init__(self, root_directory, n_workers=1, preload_modules=()):
+        self.root_directory = root_directory
+        self.preload_modules = list(preload_modules)
+        self._workers = []
+
+        # idle workers are taken from this queue to run a command. None
+        # is a placeholder for a worker that is started when needed
+        self._idle = Queue.Queue()
+        for i in range(max(1, n_workers)):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_worker,
+            args=(worker_connection, self.root_directory,
+                  self.preload_modules),
+        )
+        process.daemon = True
+        process.start()
+        worker_connection.close()
+        self._workers.append(process)
+        return process, connection
+
+    def run(self, command):
+        """Run `command` in the next available worker, logging its output
+        as it happens. Raises a ShellError if the command fails.
+        """
+        worker = self._idle.get() or self._start_worker()
+        status = None
+        try:
+            status = self._run(worker, command)
+        finally:
+            # workers that are interrupted or die are replaced with a
+            # fresh worker the next time one is needed
+            if status is None or not worker[0].is_alive():
+                worker[0].terminate()
+                worker = None
+            self._idle.put(worker)
+        if status != 0:
+            raise exceptions.ShellError(status)
+
+    def _run(self, worker, command):
+        process, connection = worker
+        read_fd, write_fd = os.pipe()
+        # keep the pipe out of any other process that is started while
+        # the command runs, which would otherwise hold the write end
+        # open and keep the output from ever ending
+        for fd in (read_fd, write_fd):
+            flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+            fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+        try:
+            connection.send(command)
+            reduction.send_handle(connection, write_fd, process.pid)
+        except (IOError, OSError):
+            os.close(read_fd)
+            return self._exit_status(process)
+        finally:
+            os.close(write_fd)
+        shell.log_output(os.fdopen(read_fd))
+        try:
+            return connection.recv()
+        except (EOFError, IOError):
+            return self._exit_status(process)
+
+    def _exit_status(self, process):
+        """The exit status of a worker that died while running a command,
+        which is reported like a shell does for killed commands
+        """
+        process.join()
+        if process.exitcode < 0:
+            return 128 - process.exitcode
+        return process.exitcode or 1
+
+    def close(self):
+        """Stop all of the workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except Queue.Empty:
+                break
+            if worker is not None:
+                try:
+                    worker[1].send(None)
+                except IOError:
+                    pass
+        for process in self._workers:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+        self._workers = []
@@ -35,8 +35,10 @@ setup(
     scripts=scripts,
     packages=[
         'flo',
+        'flo.archives',
         'flo.commands',
         'flo.resources',
+        'flo.storage',
         'flo.tasks',
         'flo.templates',
     ],
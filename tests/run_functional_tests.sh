@@ -53,7 +53,7 @@ validate_example () {
     # have the same md5 hash
     temp_dir=/tmp/${example}
     mkdir -p ${temp_dir}
-    tar -xf .flo/archive/* -C ${temp_dir}
+    tar -xf .flo/archive/*.tar.gz -C ${temp_dir}
     local_checksum=$(find ${temp_dir}/ -type f | sort | xargs cat | md5)
     rm -rf ${temp_dir}
     if [ "${local_checksum}" != "${test_checksum}" ]; then
@@ -70,6 +70,7 @@ validate_example () {
 # correct checksum is
 validate_example hello-world 040bf35be21ac0a3d6aa9ff4ff25df24
 validate_example model-correlations c2e4ae57ff2d970a076b364bab87a87f
+validate_example python-functions 95285e43d608f9f8302c835c73d6dbfb
 
 # this runs specific tests for the --start-at option
 cd $BASEDIR
@@ -115,6 +116,328 @@ sed -n '/|-> /{g;1!p;};h' .flo/flo.log | sort -C
 update_status $? "flo not running in expected deterministic order"
 cd ${EXAMPLE_ROOT}
 
+# make sure running independent tasks in parallel gives exactly the
+# same results as running them one at a time
+cd ${EXAMPLE_ROOT}/model-correlations
+flo run -f
+serial_dir=/tmp/model-correlations-serial
+rm -rf ${serial_dir} && cp -r data ${serial_dir}
+flo clean --force -j 4 | grep "^removed 5 targets$" > /dev/null
+update_status $? "cleaning in parallel did not remove every target"
+flo run -j 4
+update_status $? "running model-correlations in parallel failed"
+diff -r ${serial_dir} data
+update_status $? "parallel results differ from serial results"
+rm -rf ${serial_dir}
+cd $EXAMPLE_ROOT
+
+# make sure that targets that can not be removed are reported as errors
+# rather than crashing
+CLEAN_ROOT=/tmp/flo-clean
+rm -rf ${CLEAN_ROOT} && mkdir -p ${CLEAN_ROOT}
+cat > ${CLEAN_ROOT}/flo.yaml <<'EOF'
+---
+tasks:
+  -
+    creates: data/result.txt
+    command: echo result > {{creates}}
+EOF
+cd ${CLEAN_ROOT}
+touch data
+flo clean --force > /tmp/flo-clean.txt 2>&1
+update_status $((1-$?)) "cleaning a target that can not be removed did not fail"
+grep "Could not remove 'data/result.txt'" /tmp/flo-clean.txt > /dev/null
+update_status $? "cleaning a target that can not be removed did not name it"
+grep "Traceback" /tmp/flo-clean.txt > /dev/null
+update_status $((1-$?)) "cleaning a target that can not be removed crashed"
+rm /tmp/flo-clean.txt
+cd $EXAMPLE_ROOT
+
+# make sure that plain strings render exactly like jinja renders them
+python -c "
+from flo.templates import render_from_string, string_environment
+for text in [u'a\r\nb\rc\n', u'a\n\n', u'a\x0bb', u'a\x85b\n', u'a b']:
+    expected = string_environment.from_string(text).render()
+    assert render_from_string(text) == expected, repr(text)
+"
+update_status $? "plain strings do not render like jinja renders them"
+
+# make sure that the hash algorithm of a task overrides the global one
+HASH_ROOT=/tmp/flo-hash
+rm -rf ${HASH_ROOT} && mkdir -p ${HASH_ROOT}
+cat > ${HASH_ROOT}/flo.yaml <<'EOF'
+---
+hash: md5
+tasks:
+  -
+    creates: global.txt
+    command: echo global > {{creates}}
+  -
+    creates: override.txt
+    hash: sha256
+    command: echo override > {{creates}}
+EOF
+cd ${HASH_ROOT}
+flo run
+update_status $? "running with a global hash algorithm failed"
+grep "^global.txt,md5:" .flo/state.csv > /dev/null
+update_status $? "the global hash algorithm was not used"
+grep "^override.txt,sha256:" .flo/state.csv > /dev/null
+update_status $? "the hash algorithm of a task did not override the global one"
+cd $EXAMPLE_ROOT
+
+# make sure the sqlite state backend forgets the states of cleaned
+# targets so that they are out of sync the next time flo is run
+SQLITE_ROOT=/tmp/flo-sqlite
+rm -rf ${SQLITE_ROOT} && mkdir -p ${SQLITE_ROOT}
+cat > ${SQLITE_ROOT}/flo.yaml <<'EOF'
+---
+state_backend: sqlite
+tasks:
+  -
+    creates: data/hello_world.txt
+    command:
+      - mkdir -p $(dirname {{creates}})
+      - for i in $(seq 1 100); do echo $i hello world; done > {{creates}}
+  -
+    creates: data/word_count.dat
+    depends: data/hello_world.txt
+    command: tr ' ' '\n' < {{depends}} | sort | uniq -c > {{creates}}
+EOF
+cd ${SQLITE_ROOT}
+flo run
+update_status $? "running with the sqlite backend failed"
+flo clean -f data/word_count.dat
+n_rows=$(python -c "import sqlite3; print(sqlite3.connect('.flo/state.db')\
+.execute('SELECT COUNT(*) FROM states WHERE name = ?', \
+('data/word_count.dat',)).fetchone()[0])")
+update_status ${n_rows} "sqlite backend kept the state of a cleaned target"
+flo status | grep "data/word_count.dat" > /dev/null
+update_status $? "cleaned target is not out of sync with the sqlite backend"
+flo run
+
+# the status server reads the sqlite database from its request threads
+flo status --serve --port 8766 > /dev/null 2>&1 &
+server_pid=$!
+sleep 1
+for i in 1 2 3; do
+    curl -s http://localhost:8766/status.json | \
+        grep '"in_sync": true' > /dev/null
+    update_status $? "status server failed with the sqlite backend"
+done
+kill ${server_pid}
+cd $EXAMPLE_ROOT
+
+# make sure that the output of tasks that run in parallel is not
+# interleaved
+JOBS_ROOT=/tmp/flo-jobs
+rm -rf ${JOBS_ROOT} && mkdir -p ${JOBS_ROOT}
+cat > ${JOBS_ROOT}/flo.yaml <<'EOF'
+---
+tasks:
+  -
+    creates: a.txt
+    command:
+      - for i in 1 2 3; do echo a$i; sleep 0.2; done
+      - touch {{creates}}
+  -
+    creates: b.txt
+    command:
+      - for i in 1 2 3; do echo b$i; sleep 0.2; done
+      - touch {{creates}}
+EOF
+cd ${JOBS_ROOT}
+n_groups=$(flo run -j 2 | grep -x "[ab][123]" | cut -c1 | uniq | wc -l)
+test ${n_groups} -eq 2
+update_status $? "the output of tasks that ran in parallel was interleaved"
+cd $EXAMPLE_ROOT
+
+# make sure that tasks that share a changed dependency with a task
+# that finished are out of sync when flo is killed part way through a
+# run with the sqlite backend
+KILL_ROOT=/tmp/flo-kill
+rm -rf ${KILL_ROOT} && mkdir -p ${KILL_ROOT}
+cat > ${KILL_ROOT}/flo.yaml <<'EOF'
+---
+state_backend: sqlite
+tasks:
+  -
+    creates: a.txt
+    depends: x.txt
+    command: cp {{depends}} {{creates}}
+  -
+    creates: b.txt
+    depends: x.txt
+    command:
+      - sleep 1.618
+      - cp {{depends}} {{creates}}
+EOF
+cd ${KILL_ROOT}
+echo v1 > x.txt
+flo run > /dev/null
+echo v2 > x.txt
+flo run -j 1 > /dev/null 2>&1 &
+flo_pid=$!
+for i in $(seq 1 50); do
+    pgrep -f "sleep 1.618" > /dev/null && break
+    sleep 0.1
+done
+kill -9 ${flo_pid}
+wait ${flo_pid} 2> /dev/null
+pkill -f "sleep 1.618"
+flo status | grep "b.txt" > /dev/null
+update_status $? "task that shares a changed dependency was in sync after kill"
+cd $EXAMPLE_ROOT
+
+# make sure that starting flo does not import anything slow that it
+# does not need, which would make every command and tab completion lag
+cd ${EXAMPLE_ROOT}/hello-world
+for subcommand in run clean archive status; do
+    python ${BASEDIR}/../bin/flo --profile-startup ${subcommand} | \
+        grep "slow modules imported: none" > /dev/null
+    update_status $? "flo ${subcommand} imports slow modules on startup"
+done
+cd $EXAMPLE_ROOT
+
+# make sure the status server answers with the status of the workflow,
+# tells clients when nothing has changed since they last asked and
+# streams the events of the last run
+cd ${EXAMPLE_ROOT}/hello-world
+flo run
+flo status --serve --port 8765 > /dev/null 2>&1 &
+server_pid=$!
+sleep 1
+status_url=http://localhost:8765/status.json
+curl -s ${status_url} | grep '"in_sync": true' > /dev/null
+update_status $? "status server did not serve the status of the workflow"
+etag=$(curl -s -D - -o /dev/null ${status_url} | grep ETag | \
+    cut -d' ' -f2 | tr -d '\r')
+curl -s -D - -o /dev/null -H "If-None-Match: ${etag}" ${status_url} | \
+    grep "304 Not Modified" > /dev/null
+update_status $? "status server did not answer an unchanged status with 304"
+curl -s -m 2 http://localhost:8765/events | grep '"event": "done"' > /dev/null
+update_status $? "status server did not stream the events of the last run"
+kill ${server_pid}
+cd $EXAMPLE_ROOT
+
+# make sure incremental archives only store files that changed and
+# restore the files that differ from the archived version
+cd ${EXAMPLE_ROOT}/model-correlations
+flo run
+flo archive --incremental
+update_status $? "incremental archive failed"
+sleep 1
+flo archive --incremental | grep "(0 new objects" > /dev/null
+update_status $? "unchanged files were stored again in incremental archive"
+cp data/x_y.dat /tmp/x_y.dat
+echo "not the original" > data/x_y.dat
+manifest=$(ls .flo/archive/*.manifest | head -1)
+flo archive --restore ${manifest} | grep "restored 1 files" > /dev/null
+update_status $? "restoring incremental archive did not restore one file"
+diff /tmp/x_y.dat data/x_y.dat
+update_status $? "restoring incremental archive did not restore the contents"
+rm /tmp/x_y.dat
+cd $EXAMPLE_ROOT
+
+# make sure full archives are restored in-process and that broken
+# archives are reported as errors
+cd ${EXAMPLE_ROOT}/model-correlations
+flo archive --codec bz2 -j 2
+update_status $? "archiving with the bz2 codec failed"
+cp data/x_y.dat /tmp/x_y.dat
+echo "not the original" > data/x_y.dat
+flo archive --restore $(ls .flo/archive/*.tar.bz2 | head -1)
+update_status $? "restoring a full archive failed"
+diff /tmp/x_y.dat data/x_y.dat
+update_status $? "restoring a full archive did not restore the contents"
+rm /tmp/x_y.dat
+flo archive --list $(ls .flo/archive/*.tar.bz2 | head -1) | \
+    grep "data/x_y.dat" > /dev/null
+update_status $? "listing a full archive did not list its files"
+echo "not the original" > data/y_cdf.dat
+flo archive --restore $(ls .flo/archive/*.tar.bz2 | head -1) data/y_cdf.dat | \
+    grep "restored 1 files" > /dev/null
+update_status $? "restoring a single task did not restore only its file"
+flo status | grep "No tasks are out of sync" > /dev/null
+update_status $? "restoring a single task did not restore its state"
+
+# make sure that restoring a single task makes everything downstream of
+# it out of sync, as well as the task itself if what it depends on
+# changed since the archive was written
+echo "0	0	0" >> data/results.tsv
+flo run > /dev/null
+flo archive --restore $(ls .flo/archive/*.tar.bz2 | head -1) \
+    data/results.tsv > /dev/null
+flo status > /tmp/flo-status.txt
+grep "cut -f" /tmp/flo-status.txt > /dev/null
+update_status $? "tasks downstream of a restored task were in sync"
+grep "run_simulation.py" /tmp/flo-status.txt > /dev/null
+update_status $((1-$?)) "restored task with unchanged depends was not in sync"
+cp src/run_simulation.py /tmp/run_simulation.py
+echo "writer.writerow([0, 0, 0])" >> src/run_simulation.py
+flo run > /dev/null
+flo archive --restore $(ls .flo/archive/*.tar.bz2 | head -1) \
+    data/results.tsv > /dev/null
+flo status | grep "run_simulation.py" > /dev/null
+update_status $? "restored task with changed depends was in sync"
+mv /tmp/run_simulation.py src/run_simulation.py
+rm /tmp/flo-status.txt
+flo run > /dev/null
+echo "not an archive" > .flo/archive/broken.tar.gz
+flo archive --restore .flo/archive/broken.tar.gz > /dev/null 2>&1
+update_status $((1-$?)) "restoring a broken archive did not fail"
+cd $EXAMPLE_ROOT
+
+# make sure that archives keep empty directories and that files that
+# can not be archived are reported as errors
+ARCHIVE_ROOT=/tmp/flo-archive
+rm -rf ${ARCHIVE_ROOT} && mkdir -p ${ARCHIVE_ROOT}
+cat > ${ARCHIVE_ROOT}/flo.yaml <<'EOF'
+---
+tasks:
+  -
+    creates: empty
+    command: mkdir -p {{creates}}
+EOF
+cd ${ARCHIVE_ROOT}
+flo run > /dev/null
+flo archive > /dev/null
+rmdir empty
+flo archive --restore $(ls .flo/archive/*.tar.gz | head -1)
+test -d empty
+update_status $? "restoring a full archive did not restore an empty directory"
+rmdir empty
+flo archive --restore $(ls .flo/archive/*.tar.gz | head -1) empty
+test -d empty
+update_status $? "restoring a single task did not restore an empty directory"
+python -c "
+import sys
+from flo import archives
+from flo.archives.tar import WriteError
+try:
+    archives.write_tar('missing.tar.gz', '.', ['missing.txt'],
+                       archives.get_codec('gzip'), logger=sys.stdout)
+except WriteError:
+    pass
+else:
+    raise AssertionError('no WriteError')
+"
+update_status $? "archiving a missing file did not fail with a WriteError"
+cd $EXAMPLE_ROOT
+
+# make sure archives are read correctly when a compressed frame ends
+# exactly where a block that is read from the archive ends
+python -c "
+import StringIO
+from flo.archives.codecs import get_codec
+for codec in map(get_codec, ['gzip', 'bz2']):
+    first, second = codec.compress('a' * 1000), codec.compress('b' * 1000)
+    reader = codec.reader(StringIO.StringIO(first + second))
+    reader.block_size = len(first)
+    assert reader.read() == 'a' * 1000 + 'b' * 1000, codec.name
+"
+update_status $? "frames that end at the end of a block were not read"
+
 # make sure flo runs equally well with non-standard config
 # files. first run this example using the standard issue flo.yaml and
 # then run it with a slightly modified version to make sure everything